@@ -15,7 +15,6 @@ from app.database import Base
 target_metadata = Base.metadata
 
 def get_url():
-    # Ждем установки DATABASE_URL
     url = settings.DATABASE_URL
     print(f"Using DATABASE_URL: {url}")
     return url
@@ -0,0 +1,64 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Таблицы могли быть созданы раньше через metadata.create_all
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('username', sa.String(), nullable=True),
+            sa.Column('hashed_password', sa.String(), nullable=True),
+            sa.Column('telegram_id', sa.String(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('telegram_id'),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    if not inspector.has_table('messages'):
+        op.create_table(
+            'messages',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('sender_id', sa.Integer(), nullable=True),
+            sa.Column('recipient_id', sa.Integer(), nullable=True),
+            sa.Column('telegram_message_id', sa.String(), nullable=True),
+            sa.Column('is_bot_message', sa.Boolean(), nullable=True),
+            sa.ForeignKeyConstraint(['sender_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['recipient_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_messages_id', 'messages', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_id', table_name='messages')
+    op.drop_table('messages')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,41 @@
+"""message history indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    'ix_messages_sender_created': ['sender_id', 'created_at', 'id'],
+    'ix_messages_recipient_created': ['recipient_id', 'created_at', 'id'],
+    'ix_messages_sender_recipient_created': ['sender_id', 'recipient_id', 'created_at', 'id'],
+}
+
+
+def upgrade() -> None:
+    # Индексы под keyset-пагинацию по (created_at, id); metadata.create_all
+    # мог уже создать их на новой базе
+    inspector = sa.inspect(op.get_bind())
+    existing = {index['name'] for index in inspector.get_indexes('messages')}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'messages', columns)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_sender_recipient_created', table_name='messages')
+    op.drop_index('ix_messages_recipient_created', table_name='messages')
+    op.drop_index('ix_messages_sender_created', table_name='messages')
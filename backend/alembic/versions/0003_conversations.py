@@ -0,0 +1,66 @@
+"""conversations
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('conversations'):
+        return
+
+    op.create_table(
+        'conversations',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('peer_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['peer_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'peer_id'),
+    )
+    op.create_index(
+        'ix_conversations_user_last_message', 'conversations',
+        ['user_id', 'last_message_at']
+    )
+
+    # Заполняем диалоги по существующей истории; старые сообщения
+    # считаются прочитанными
+    op.execute(
+        """
+        INSERT INTO conversations (user_id, peer_id, last_message_id, last_message_at, unread_count)
+        SELECT user_id, peer_id, MAX(id), MAX(created_at), 0
+        FROM (
+            SELECT sender_id AS user_id, recipient_id AS peer_id, id, created_at
+            FROM messages
+            WHERE sender_id IS NOT NULL AND recipient_id IS NOT NULL
+            UNION ALL
+            SELECT recipient_id AS user_id, sender_id AS peer_id, id, created_at
+            FROM messages
+            WHERE sender_id IS NOT NULL AND recipient_id IS NOT NULL
+              AND recipient_id != sender_id
+        ) AS history
+        GROUP BY user_id, peer_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_user_last_message', table_name='conversations')
+    op.drop_table('conversations')
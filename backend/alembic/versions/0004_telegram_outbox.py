@@ -0,0 +1,49 @@
+"""telegram outbox
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('telegram_outbox'):
+        return
+
+    op.create_table(
+        'telegram_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('chat_id', sa.String(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_telegram_outbox_id', 'telegram_outbox', ['id'])
+    op.create_index(
+        'ix_telegram_outbox_status_next_attempt', 'telegram_outbox',
+        ['status', 'next_attempt_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_telegram_outbox_status_next_attempt', table_name='telegram_outbox')
+    op.drop_index('ix_telegram_outbox_id', table_name='telegram_outbox')
+    op.drop_table('telegram_outbox')
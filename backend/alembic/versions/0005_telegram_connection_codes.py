@@ -0,0 +1,46 @@
+"""telegram connection codes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('telegram_connection_codes'):
+        return
+
+    op.create_table(
+        'telegram_connection_codes',
+        sa.Column('code', sa.String(), nullable=False),
+        sa.Column('telegram_id', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('code'),
+    )
+    op.create_index(
+        'ix_telegram_connection_codes_telegram_id', 'telegram_connection_codes',
+        ['telegram_id']
+    )
+    op.create_index(
+        'ix_telegram_connection_codes_expires_at', 'telegram_connection_codes',
+        ['expires_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_telegram_connection_codes_expires_at', table_name='telegram_connection_codes')
+    op.drop_index('ix_telegram_connection_codes_telegram_id', table_name='telegram_connection_codes')
+    op.drop_table('telegram_connection_codes')
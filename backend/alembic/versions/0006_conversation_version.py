@@ -0,0 +1,35 @@
+"""conversation version
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('conversations')}
+    if 'version' in columns:
+        return
+
+    op.add_column(
+        'conversations',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_column('version')
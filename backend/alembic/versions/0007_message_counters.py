@@ -0,0 +1,110 @@
+"""message counters
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _is_empty(table: str) -> bool:
+    return op.get_bind().execute(sa.text(f'SELECT 1 FROM {table} LIMIT 1')).first() is None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    columns = {column['name'] for column in inspector.get_columns('conversations')}
+    if 'sent_count' not in columns:
+        op.add_column(
+            'conversations',
+            sa.Column('sent_count', sa.Integer(), nullable=False, server_default='0'),
+        )
+        op.add_column(
+            'conversations',
+            sa.Column('received_count', sa.Integer(), nullable=False, server_default='0'),
+        )
+        op.execute(
+            """
+            UPDATE conversations SET
+                sent_count = (
+                    SELECT COUNT(*) FROM messages
+                    WHERE messages.sender_id = conversations.user_id
+                      AND messages.recipient_id = conversations.peer_id
+                ),
+                received_count = (
+                    SELECT COUNT(*) FROM messages
+                    WHERE messages.sender_id = conversations.peer_id
+                      AND messages.recipient_id = conversations.user_id
+                      AND messages.sender_id != messages.recipient_id
+                )
+            """
+        )
+
+    if not inspector.has_table('message_counters'):
+        op.create_table(
+            'message_counters',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('sent_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('received_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+    # Таблицу могла создать пустой create_all при старте приложения
+    if _is_empty('message_counters'):
+        op.execute(
+            """
+            INSERT INTO message_counters (user_id, sent_count, received_count)
+            SELECT user_id, SUM(sent_count), SUM(received_count)
+            FROM conversations
+            GROUP BY user_id
+            """
+        )
+
+    if not inspector.has_table('message_daily_counters'):
+        op.create_table(
+            'message_daily_counters',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('sent_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('received_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id', 'day'),
+        )
+    if _is_empty('message_daily_counters'):
+        op.execute(
+            """
+            INSERT INTO message_daily_counters (user_id, day, sent_count, received_count)
+            SELECT user_id, day, SUM(sent), SUM(received)
+            FROM (
+                SELECT sender_id AS user_id, DATE(created_at) AS day, 1 AS sent, 0 AS received
+                FROM messages
+                WHERE sender_id IS NOT NULL AND created_at IS NOT NULL
+                UNION ALL
+                SELECT recipient_id AS user_id, DATE(created_at) AS day, 0 AS sent, 1 AS received
+                FROM messages
+                WHERE recipient_id IS NOT NULL AND created_at IS NOT NULL
+                  AND recipient_id != sender_id
+            ) AS history
+            GROUP BY user_id, day
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('message_daily_counters')
+    op.drop_table('message_counters')
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_column('received_count')
+        batch_op.drop_column('sent_count')
@@ -0,0 +1,51 @@
+"""message full-text search
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if bind.dialect.name == 'postgresql':
+        # Вычисляемая колонка заполняется для всех строк при добавлении
+        columns = {column['name'] for column in inspector.get_columns('messages')}
+        if 'search_vector' not in columns:
+            op.execute(
+                "ALTER TABLE messages ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+                "(to_tsvector('simple', coalesce(content, ''))) STORED"
+            )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_messages_search ON messages USING gin (search_vector)")
+
+    elif bind.dialect.name == 'sqlite':
+        if not inspector.has_table('messages_fts'):
+            op.execute(
+                "CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', "
+                "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+        # Перестроение индекса по всем существующим сообщениям
+        op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_messages_search")
+        op.execute("ALTER TABLE messages DROP COLUMN IF EXISTS search_vector")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS messages_fts")
@@ -0,0 +1,50 @@
+"""user directory indexes
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = {index['name'] for index in inspector.get_indexes('users')}
+
+    if bind.dialect.name == 'postgresql':
+        if 'ix_users_username_lower' not in existing:
+            op.execute('CREATE INDEX ix_users_username_lower ON users (lower(username) COLLATE "C", id)')
+
+        # pg_trgm может быть недоступен (нет прав на CREATE EXTENSION);
+        # тогда поиск по подстроке работает без индекса
+        available = bind.execute(sa.text(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )).first()
+        if available is not None:
+            try:
+                with bind.begin_nested():
+                    bind.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            except sa.exc.DBAPIError:
+                available = None
+        if available is not None and 'ix_users_username_trgm' not in existing:
+            op.execute('CREATE INDEX ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops)')
+
+    elif 'ix_users_username_lower' not in existing:
+        op.execute('CREATE INDEX ix_users_username_lower ON users (lower(username), id)')
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS ix_users_username_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_users_username_lower')
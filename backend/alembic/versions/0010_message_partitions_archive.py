@@ -0,0 +1,164 @@
+"""message partitions and archive
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Секций вперед от текущего месяца (дальше их создает app/archive.py)
+PARTITIONS_AHEAD = 3
+
+COLUMNS = 'id, content, created_at, sender_id, recipient_id, telegram_message_id, is_bot_message'
+
+MESSAGE_INDEXES = [
+    'CREATE INDEX ix_messages_id ON messages (id)',
+    'CREATE INDEX ix_messages_sender_created ON messages (sender_id, created_at, id)',
+    'CREATE INDEX ix_messages_recipient_created ON messages (recipient_id, created_at, id)',
+    'CREATE INDEX ix_messages_sender_recipient_created ON messages (sender_id, recipient_id, created_at, id)',
+    'CREATE INDEX ix_messages_search ON messages USING gin (search_vector)',
+]
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass('messages'))"
+    )).scalar()
+
+
+def _create_messages(partitioned: bool, sequence: str) -> None:
+    """Новая таблица messages; на время создания старая переименована"""
+    op.execute(
+        f"""
+        CREATE TABLE messages (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            content VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE {'NOT NULL' if partitioned else ''},
+            sender_id INTEGER REFERENCES users (id),
+            recipient_id INTEGER REFERENCES users (id),
+            telegram_message_id VARCHAR,
+            is_bot_message BOOLEAN,
+            search_vector tsvector GENERATED ALWAYS AS
+                (to_tsvector('simple', coalesce(content, ''))) STORED,
+            PRIMARY KEY ({'id, created_at' if partitioned else 'id'})
+        ) {'PARTITION BY RANGE (created_at)' if partitioned else ''}
+        """
+    )
+
+
+def _rebuild_messages(bind, partitioned: bool) -> None:
+    """
+    Пересоздание messages с копированием строк: секционированной таблицей
+    Postgres может стать только новая таблица. Первичный ключ секционированной
+    таблицы обязан включать created_at, поэтому он (id, created_at).
+    Миграция переписывает всю историю - на больших базах ее стоит запускать
+    в окно обслуживания
+    """
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('messages', 'id')")).scalar()
+    op.execute('ALTER TABLE messages RENAME TO messages_old')
+    op.execute('ALTER TABLE messages_old RENAME CONSTRAINT messages_pkey TO messages_old_pkey')
+    for name in ('ix_messages_id', 'ix_messages_sender_created', 'ix_messages_recipient_created',
+                 'ix_messages_sender_recipient_created', 'ix_messages_search'):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+    _create_messages(partitioned, sequence)
+    if partitioned:
+        first = bind.execute(sa.text('SELECT min(created_at) FROM messages_old')).scalar()
+        now = datetime.utcnow()
+        month = datetime((first or now).year, (first or now).month, 1)
+        last = _add_months(datetime(now.year, now.month, 1), PARTITIONS_AHEAD)
+        while month <= last:
+            op.execute(
+                f"CREATE TABLE messages_p{month:%Y%m} PARTITION OF messages "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+            )
+            month = _add_months(month, 1)
+        op.execute('CREATE TABLE messages_default PARTITION OF messages DEFAULT')
+        # Ключ секционирования не может быть NULL
+        op.execute(
+            f"INSERT INTO messages ({COLUMNS}) SELECT id, content, "
+            "coalesce(created_at, timezone('utc', now())), sender_id, recipient_id, "
+            "telegram_message_id, is_bot_message FROM messages_old"
+        )
+    else:
+        op.execute(f'INSERT INTO messages ({COLUMNS}) SELECT {COLUMNS} FROM messages_old')
+
+    # Последовательность id переходит к новой таблице до удаления старой
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY messages.id')
+    op.execute('DROP TABLE messages_old')
+    for statement in MESSAGE_INDEXES:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('messages_archive'):
+        op.create_table(
+            'messages_archive',
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('content', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('sender_id', sa.Integer(), nullable=True),
+            sa.Column('recipient_id', sa.Integer(), nullable=True),
+            sa.Column('telegram_message_id', sa.String(), nullable=True),
+            sa.Column('is_bot_message', sa.Boolean(), nullable=True),
+            sa.Column('archived_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['sender_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['recipient_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(
+            'ix_messages_archive_sender_created', 'messages_archive',
+            ['sender_id', 'created_at', 'id'],
+        )
+        op.create_index(
+            'ix_messages_archive_recipient_created', 'messages_archive',
+            ['recipient_id', 'created_at', 'id'],
+        )
+        op.create_index(
+            'ix_messages_archive_sender_recipient_created', 'messages_archive',
+            ['sender_id', 'recipient_id', 'created_at', 'id'],
+        )
+
+    # На SQLite секционирования нет: messages остается одной таблицей,
+    # ее размер ограничивает только архивация
+    if bind.dialect.name == 'postgresql' and not _is_partitioned(bind):
+        _rebuild_messages(bind, partitioned=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql' and _is_partitioned(bind):
+        # Секции удаляются вместе с родительской таблицей
+        _rebuild_messages(bind, partitioned=False)
+
+    # Архив возвращается в messages, чтобы откат не терял историю
+    op.execute(f'INSERT INTO messages ({COLUMNS}) SELECT {COLUMNS} FROM messages_archive')
+    if bind.dialect.name == 'sqlite':
+        op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+    op.drop_index('ix_messages_archive_sender_recipient_created', table_name='messages_archive')
+    op.drop_index('ix_messages_archive_recipient_created', table_name='messages_archive')
+    op.drop_index('ix_messages_archive_sender_created', table_name='messages_archive')
+    op.drop_table('messages_archive')
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, func, insert, select, text, union_all, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .database import SessionLocal, dispose_engine, get_engine
+from .models.archive import ArchivedMessage
+from .models.conversation import Conversation
+from .models.message import Message
+from .search import unindex_messages
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock: архивацию одновременно выполняет только один воркер
+ARCHIVE_LOCK_ID = 7_301_014
+
+# Колонки сообщения в порядке таблицы messages; у архива те же колонки
+MESSAGE_COLUMNS = tuple(Message.__table__.columns.keys())
+
+# Месячные секции messages на Postgres: messages_pYYYYMM с диапазоном
+# [первое число месяца, первое число следующего). Строки вне созданных
+# секций попадают в messages_default
+PARTITION_PREFIX = "messages_p"
+DEFAULT_PARTITION = "messages_default"
+_PARTITION_NAME = re.compile(r"^messages_p(\d{4})(\d{2})$")
+
+
+def message_columns(entity) -> list:
+    """Колонки messages или messages_archive в порядке таблицы messages"""
+    return [entity.__table__.c[name] for name in MESSAGE_COLUMNS]
+
+
+def message_history(*names: str):
+    """
+    Вся история (оперативная таблица и архив) как подзапрос с колонками
+    names. Условия на подзапрос СУБД переносит в обе ветки UNION ALL,
+    поэтому каждая ветка идет по своим индексам
+    """
+    return union_all(
+        select(*(Message.__table__.c[name] for name in names)),
+        select(*(ArchivedMessage.__table__.c[name] for name in names)),
+    ).subquery("history")
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """Месяц секции по ее имени; None для секций не по схеме (например, default)"""
+    match = _PARTITION_NAME.match(name)
+    return datetime(int(match[1]), int(match[2]), 1) if match else None
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    """Секционирована ли messages (Postgres после миграции 0010)"""
+    if db.bind.dialect.name != "postgresql":
+        return False
+    return await db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass('messages'))"
+    ))
+
+
+async def list_partitions(db: AsyncSession) -> List[str]:
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'messages'::regclass ORDER BY c.relname"
+    ))
+    return list(result.scalars().all())
+
+
+async def ensure_partitions(db: AsyncSession, now: datetime, ahead: int) -> List[str]:
+    """
+    Создание секций текущего и ahead следующих месяцев. Секция, в диапазон
+    которой уже попали строки messages_default, не создается (Postgres
+    этого не позволяет) - такие строки остаются в default, пока их не
+    перенесет архивация
+    """
+    existing = set(await list_partitions(db))
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(month_start(now), offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        try:
+            async with db.begin_nested():
+                await db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF messages "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+                ))
+        except DBAPIError as e:
+            logger.warning("Cannot create message partition", extra={"partition": name, "error": str(e)})
+            continue
+        created.append(name)
+    return created
+
+
+async def drop_archived_partitions(db: AsyncSession, cutoff: datetime) -> List[str]:
+    """Удаление секций, целиком старше cutoff и уже опустевших после архивации"""
+    dropped = []
+    for name in await list_partitions(db):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        if (await db.execute(text(f"SELECT 1 FROM {name} LIMIT 1"))).first() is not None:
+            continue
+        await db.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+async def archive_batch(db: AsyncSession, cutoff: datetime, batch_size: int) -> int:
+    """
+    Перенос до batch_size самых старых сообщений с created_at < cutoff в
+    messages_archive; возвращает число перенесенных. Строки выбираются по
+    возрастанию id (индекс первичного ключа), что совпадает с порядком
+    отправки. Версии затронутых диалогов увеличиваются в той же
+    транзакции: история без archived=true изменилась, и старые ETag не
+    должны давать 304. Коммит делает вызывающий.
+    """
+    stmt = (
+        select(*message_columns(Message))
+        .where(Message.created_at < cutoff)
+        .order_by(Message.id)
+        .limit(batch_size)
+    )
+    if db.bind.dialect.name == "postgresql":
+        # Строки, которые сейчас меняет доставка в Telegram, уйдут в следующий раз
+        stmt = stmt.with_for_update(skip_locked=True)
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return 0
+
+    archived_at = datetime.utcnow()
+    await db.execute(insert(ArchivedMessage), [
+        {**row._asdict(), "archived_at": archived_at} for row in rows
+    ])
+    await unindex_messages(db, rows)
+    # Условие на created_at отсекает на Postgres секции новее cutoff
+    await db.execute(
+        delete(Message)
+        .where(Message.id.in_([row.id for row in rows]), Message.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+
+    pairs = set()
+    for row in rows:
+        pairs.add((row.sender_id, row.recipient_id))
+        pairs.add((row.recipient_id, row.sender_id))
+    # Строки диалогов блокируются по возрастанию ключа, как в record_messages
+    for user_id, peer_id in sorted(pairs):
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.user_id == user_id, Conversation.peer_id == peer_id)
+            .values(version=Conversation.version + 1)
+        )
+    return len(rows)
+
+
+class MessageArchiver:
+    """
+    Фоновое обслуживание истории сообщений: на Postgres - создание месячных
+    секций messages заранее и удаление старых, опустевших после архивации;
+    на обеих СУБД - перенос сообщений старше archive_after_days в архив
+    пачками, каждая в своей короткой транзакции.
+
+    Без секций (SQLite или Postgres до миграции 0010) работает только
+    перенос пачками: запросы истории и так ограничены индексами
+    (..., created_at, id), а архивация держит таблицу компактной.
+    Счетчики архивация не меняет: сверка считает сообщения по обеим
+    таблицам (см. message_history); у диалогов растет только version
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        archive_after_days: int,
+        batch_size: int = 1000,
+        partitions_ahead: int = 3,
+    ):
+        self.interval = interval
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+        self.partitions_ahead = partitions_ahead
+        self.runs = 0
+        self.archived = 0
+        self.partitions_created = 0
+        self.partitions_dropped = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration = 0.0
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запуск фоновой задачи (interval <= 0 - отключена)"""
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # Первый проход сразу: секции текущего месяца нужны до первых вставок
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception("Error archiving messages")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Один проход обслуживания; возвращает число перенесенных сообщений"""
+        engine = get_engine()
+        if engine.dialect.name != "postgresql":
+            return await self._maintain()
+
+        async with engine.connect() as conn:
+            locked = await conn.scalar(select(func.pg_try_advisory_lock(ARCHIVE_LOCK_ID)))
+            await conn.commit()
+            if not locked:
+                return 0
+            try:
+                return await self._maintain()
+            finally:
+                await conn.execute(select(func.pg_advisory_unlock(ARCHIVE_LOCK_ID)))
+                await conn.commit()
+
+    async def _maintain(self) -> int:
+        started = time.monotonic()
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=self.archive_after_days)
+        self.running = True
+        archived = 0
+        try:
+            async with SessionLocal() as db:
+                partitioned = await is_partitioned(db)
+                if partitioned:
+                    created = await ensure_partitions(db, now, self.partitions_ahead)
+                    await db.commit()
+                    self.partitions_created += len(created)
+                    if created:
+                        logger.info("Message partitions created", extra={"partitions": created})
+
+            if self.archive_after_days > 0:
+                while True:
+                    async with SessionLocal() as db:
+                        moved = await archive_batch(db, cutoff, self.batch_size)
+                        await db.commit()
+                    archived += moved
+                    self.archived += moved
+                    if moved < self.batch_size:
+                        break
+                    # Пауза между пачками, чтобы не занимать соединение подряд
+                    await asyncio.sleep(0)
+
+                if partitioned:
+                    async with SessionLocal() as db:
+                        dropped = await drop_archived_partitions(db, cutoff)
+                        await db.commit()
+                    self.partitions_dropped += len(dropped)
+                    if dropped:
+                        logger.info("Message partitions dropped", extra={"partitions": dropped})
+        finally:
+            self.running = False
+            self.runs += 1
+            self.last_run_at = datetime.utcnow()
+            self.last_duration = time.monotonic() - started
+        if archived:
+            logger.info("Messages archived", extra={"archived": archived, "cutoff": cutoff.isoformat()})
+        return archived
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "archived": self.archived,
+            "partitions_created": self.partitions_created,
+            "partitions_dropped": self.partitions_dropped,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_seconds": round(self.last_duration, 3),
+        }
+
+
+message_archiver = MessageArchiver(
+    interval=settings.MESSAGE_ARCHIVE_INTERVAL,
+    archive_after_days=settings.MESSAGE_ARCHIVE_AFTER_DAYS,
+    batch_size=settings.MESSAGE_ARCHIVE_BATCH_SIZE,
+    partitions_ahead=settings.MESSAGE_PARTITIONS_AHEAD,
+)
+
+
+if __name__ == "__main__":
+    # Разовый проход: python -m app.archive
+    from .log import setup_logging, shutdown_logging
+
+    async def main():
+        archived = await message_archiver.run_once()
+        logger.info("Message archive maintained", extra={"archived": archived, **message_archiver.stats()})
+        await dispose_engine()
+
+    setup_logging()
+    asyncio.run(main())
+    shutdown_logging()
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import make_url
+from .config import settings
+from .database import SessionLocal
+from .models.message import Message
+from .realtime import hub
+
+logger = logging.getLogger(__name__)
+
+# Сколько сообщений догружать за раз после переподключения
+REPLAY_BATCH_SIZE = 500
+# Догрузка начинается с запасом до момента обрыва: id выдаются до
+# коммита, и сообщение с меньшим id может закоммититься позже большего.
+# Запас покрывает транзакции короче этого времени и расхождение часов
+REPLAY_OVERLAP_SECONDS = 60
+# Сколько последних id помнить, чтобы не доставлять событие дважды
+SEEN_IDS_SIZE = 10000
+# Интервал проверки соединения LISTEN, секунды
+HEALTHCHECK_INTERVAL = 30
+# Ограничение на размер payload NOTIFY (у Postgres 8000 байт)
+MAX_PAYLOAD_BYTES = 7500
+
+
+def message_event(message: Message) -> dict:
+    """Компактное событие о новом сообщении"""
+    return {"id": message.id, "s": message.sender_id, "r": message.recipient_id}
+
+
+async def dispatch_events(events: List[dict]) -> None:
+    """
+    Доставка событий локальным подписчикам: сообщения догружаются из БД
+    одним запросом и только для пользователей, подключенных к этому воркеру
+    """
+    ids = [
+        event["id"] for event in events
+        if hub.has_subscribers(event["s"], event["r"])
+    ]
+    if not ids:
+        return
+
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(Message).where(Message.id.in_(ids)).order_by(Message.id)
+        )
+        for message in result.scalars().all():
+            hub.publish_message(message)
+
+
+class Backplane(ABC):
+    """
+    Шина событий между воркерами: событие о сообщении из любого процесса
+    доставляется в dispatch_events() каждого процесса. stage_messages()
+    вызывается в транзакции вставки, publish_messages() - после коммита;
+    шина сама выбирает, на каком шаге отправлять событие
+    """
+
+    def __init__(self):
+        self.published = 0
+        self.received = 0
+        self.replayed = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def stage_messages(self, db: AsyncSession, messages: Sequence[Message]) -> None:
+        """События о новых сообщениях в транзакции вставки (до коммита)"""
+
+    @abstractmethod
+    async def publish_messages(self, messages: Sequence[Message]) -> None:
+        """События о новых сообщениях после коммита"""
+
+    async def publish_message(self, message: Message) -> None:
+        await self.publish_messages([message])
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "published": self.published,
+            "received": self.received,
+            "replayed": self.replayed,
+        }
+
+
+class MemoryBackplane(Backplane):
+    """Шина внутри одного процесса: для одного воркера и тестов"""
+
+    async def publish_messages(self, messages: Sequence[Message]) -> None:
+        # Сообщения уже в памяти, повторно читать их из БД не нужно
+        for message in messages:
+            self.published += 1
+            self.received += 1
+            hub.publish_message(message)
+
+
+class PostgresBackplane(Backplane):
+    """
+    Шина на Postgres LISTEN/NOTIFY.
+
+    NOTIFY выполняется в транзакции вставки сообщений и уходит подписчикам
+    атомарно с коммитом: событие не теряется при падении процесса после
+    коммита и не требует отдельного соединения.
+
+    Каждый воркер держит отдельное соединение asyncpg с LISTEN на канал.
+    После обрыва соединение восстанавливается, а сообщения, созданные
+    начиная с REPLAY_OVERLAP_SECONDS до последнего момента, когда
+    соединение было живо, догружаются из таблицы messages; уже
+    доставленные id отбрасываются.
+    """
+
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 1.0):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.last_id: Optional[int] = None
+        # Последний момент, когда соединение LISTEN точно работало
+        self.last_seen_at: Optional[datetime] = None
+        self._seen: OrderedDict = OrderedDict()
+        # Задачи доставки, запущенные из callback asyncpg: ссылки держим,
+        # чтобы задачу не собрал сборщик мусора до завершения
+        self._dispatching: set = set()
+        self.reconnects = 0
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+        self._closed: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        async with SessionLocal() as db:
+            self.last_id = await db.scalar(select(func.max(Message.id))) or 0
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._dispatching):
+            task.cancel()
+        if self._dispatching:
+            await asyncio.gather(*self._dispatching, return_exceptions=True)
+
+    async def stage_messages(self, db: AsyncSession, messages: Sequence[Message]) -> None:
+        """События пачкой: несколько событий в одном NOTIFY (JSON-массив)"""
+        payloads = []
+        batch: List[str] = []
+        size = 2
+        for message in messages:
+            event = json.dumps(message_event(message))
+            if batch and size + len(event) + 1 > MAX_PAYLOAD_BYTES:
+                payloads.append("[" + ",".join(batch) + "]")
+                batch, size = [], 2
+            batch.append(event)
+            size += len(event) + 1
+        if batch:
+            payloads.append("[" + ",".join(batch) + "]")
+        for payload in payloads:
+            await db.execute(select(func.pg_notify(self.channel, payload)))
+        self.published += len(messages)
+
+    async def publish_messages(self, messages: Sequence[Message]) -> None:
+        # NOTIFY уже отправлен коммитом транзакции
+        pass
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            events = json.loads(payload)
+        except ValueError:
+            return
+        if isinstance(events, dict):
+            events = [events]
+        events = self._fresh(events)
+        if not events:
+            return
+        self.received += len(events)
+        self.last_id = max([self.last_id or 0, *(event["id"] for event in events)])
+        task = asyncio.create_task(self._dispatch(events))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatch_done)
+
+    def _dispatch_done(self, task: asyncio.Task) -> None:
+        self._dispatching.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Backplane dispatch task failed", exc_info=task.exception())
+
+    def _on_termination(self, connection) -> None:
+        if self._closed is not None:
+            self._closed.set()
+
+    async def _dispatch(self, events: List[dict]) -> None:
+        try:
+            await dispatch_events(events)
+        except Exception as e:
+            logger.exception("Error dispatching backplane events")
+
+    def _fresh(self, events: List[dict]) -> List[dict]:
+        """События, которые еще не доставлялись (по id сообщения)"""
+        fresh = []
+        for event in events:
+            if event["id"] in self._seen:
+                continue
+            self._seen[event["id"]] = None
+            fresh.append(event)
+        while len(self._seen) > SEEN_IDS_SIZE:
+            self._seen.popitem(last=False)
+        return fresh
+
+    async def _replay(self, since: datetime) -> None:
+        """Догрузка сообщений, пропущенных пока не было соединения"""
+        position = (since - timedelta(seconds=REPLAY_OVERLAP_SECONDS), 0)
+        while True:
+            created_at, message_id = position
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    select(Message.id, Message.sender_id, Message.recipient_id, Message.created_at)
+                    .where(or_(
+                        Message.created_at > created_at,
+                        and_(Message.created_at == created_at, Message.id > message_id),
+                    ))
+                    .order_by(Message.created_at, Message.id)
+                    .limit(REPLAY_BATCH_SIZE)
+                )
+                rows = result.all()
+            if not rows:
+                return
+            position = (rows[-1].created_at, rows[-1].id)
+            events = self._fresh([
+                {"id": row.id, "s": row.sender_id, "r": row.recipient_id}
+                for row in rows
+            ])
+            if events:
+                self.last_id = max(self.last_id or 0, *(event["id"] for event in events))
+                self.replayed += len(events)
+                await self._dispatch(events)
+            if len(rows) < REPLAY_BATCH_SIZE:
+                return
+
+    async def _listen_forever(self) -> None:
+        import asyncpg
+
+        first = True
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                self._closed = asyncio.Event()
+                connection.add_termination_listener(self._on_termination)
+                await connection.add_listener(self.channel, self._on_notification)
+                self.connected = True
+                if not first and self.last_seen_at is not None:
+                    await self._replay(self.last_seen_at)
+                first = False
+                self.last_seen_at = datetime.utcnow()
+                while not self._closed.is_set():
+                    try:
+                        await asyncio.wait_for(self._closed.wait(), HEALTHCHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # Проверка, что соединение живо (полуоткрытый TCP)
+                        await connection.fetchval("SELECT 1", timeout=HEALTHCHECK_INTERVAL)
+                        self.last_seen_at = datetime.utcnow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Backplane connection error", extra={"error": str(e)})
+            finally:
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            self.reconnects += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "last_id": self.last_id,
+        }
+
+
+def create_backplane() -> Backplane:
+    """Шина по настройке BACKPLANE (auto - Postgres, если база Postgres)"""
+    url = make_url(settings.DATABASE_URL)
+    backend = settings.BACKPLANE
+    if backend == "auto":
+        backend = "postgres" if url.get_backend_name() == "postgresql" else "memory"
+
+    if backend == "postgres":
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBackplane(dsn, settings.BACKPLANE_CHANNEL)
+    return MemoryBackplane()
+
+backplane = create_backplane()
@@ -1,21 +1,11 @@
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
-from sqlalchemy.orm import Session
 from .config import settings
-from .database import SessionLocal
-from .models.user import User
 
 # Инициализация бота и диспетчера
 bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
 dp = Dispatcher()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        return db
-    finally:
-        db.close()
-
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
     """
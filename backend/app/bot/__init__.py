@@ -1,3 +1,3 @@
-from .bot import start_bot, stop_bot, bot, connection_codes
+from .bot import start_bot, stop_bot, bot, code_store, process_update
 
-__all__ = ['start_bot', 'stop_bot', 'bot', 'connection_codes'] 
\ No newline at end of file
+__all__ = ['start_bot', 'stop_bot', 'bot', 'code_store', 'process_update'] 
\ No newline at end of file
@@ -1,16 +1,20 @@
+import logging
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command
+from aiogram.types import Update
 from ..config import settings
-import random
-import string
+from ..transport import telegram_transport
+from .codes import code_store
 import asyncio
 
-# Создаем экземпляр бота
-bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+logger = logging.getLogger(__name__)
+
+# Создаем экземпляр бота на общем транспорте приложения
+bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, session=telegram_transport)
 dp = Dispatcher()
 
-# Глобальная переменная для хранения кодов подключения
-connection_codes = {}
+# Обновления из webhook, которые обрабатываются в фоне
+_update_tasks = set()
 
 @dp.message(Command("start"))
 async def cmd_start(message):
@@ -19,40 +23,67 @@ async def cmd_start(message):
     """
     try:
         # Генерируем уникальный код для подключения
-        code = ''.join(random.choices(string.digits, k=6))
-        connection_codes[code] = message.from_user.id
-        
-        print(f"Generated code {code} for Telegram ID {message.from_user.id}")
+        code = await code_store.issue(message.from_user.id)
         
         await message.answer(
             f"Ваш код для подключения: {code}\n\n"
-            "Введите этот код на сайте для привязки Telegram аккаунта."
+            f"Код действует {code_store.ttl // 60} мин. "
+            "Введите его на сайте для привязки Telegram аккаунта."
         )
     except Exception as e:
-        print(f"Error in start command: {e}")
+        logger.exception("Error in start command")
+
+def process_update(data: dict) -> None:
+    """
+    Передача обновления из webhook в диспетчер. Обработка идет в фоновой
+    задаче, чтобы Telegram сразу получил ответ 200
+    """
+    update = Update.model_validate(data, context={"bot": bot})
+    task = asyncio.create_task(_feed_update(update))
+    _update_tasks.add(task)
+    task.add_done_callback(_update_tasks.discard)
+
+async def _feed_update(update: Update) -> None:
+    try:
+        await dp.feed_update(bot, update)
+    except Exception as e:
+        logger.exception("Error processing update", extra={"update_id": update.update_id})
+
+async def setup_webhook():
+    """
+    Регистрация webhook в Telegram
+    """
+    url = settings.TELEGRAM_WEBHOOK_URL.rstrip("/") + settings.TELEGRAM_WEBHOOK_PATH
+    await bot.set_webhook(
+        url=url,
+        secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("Webhook set", extra={"url": url})
 
 async def start_bot():
     """
-    Функция запуска бота
+    Функция запуска бота: webhook или long polling в зависимости от TELEGRAM_MODE
     """
     try:
-        print("Starting bot...")
-        print(f"Bot token: {settings.TELEGRAM_BOT_TOKEN[:5]}...")  # Показываем только начало токена
-        await dp.start_polling(bot, skip_updates=True)
+        logger.info("Starting bot", extra={"mode": settings.TELEGRAM_MODE})
+        if settings.TELEGRAM_MODE == "webhook":
+            await setup_webhook()
+        elif settings.TELEGRAM_MODE == "polling":
+            await dp.start_polling(bot, skip_updates=True, handle_signals=False)
     except Exception as e:
-        print(f"Error starting bot: {e}")
-        if not bot.session.closed:
-            await bot.session.close()
+        logger.exception("Error starting bot")
 
 async def stop_bot():
     """
-    Функция остановки бота
+    Функция остановки бота. Общий транспорт закрывается отдельно,
+    после остановки всех отправителей
     """
     try:
-        if not bot.session.closed:
-            await bot.session.close()
+        if _update_tasks:
+            await asyncio.wait(_update_tasks, timeout=5)
     except Exception as e:
-        print(f"Error stopping bot: {e}")
+        logger.exception("Error stopping bot")
 
 # Экспортируем бота для использования в других модулях
-__all__ = ['bot', 'dp', 'connection_codes', 'start_bot', 'stop_bot'] 
\ No newline at end of file
+__all__ = ['bot', 'dp', 'code_store', 'process_update', 'start_bot', 'stop_bot'] 
\ No newline at end of file
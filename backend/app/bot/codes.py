@@ -0,0 +1,161 @@
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import SessionLocal
+from ..models.connection_code import ConnectionCode
+
+# Сколько раз пробовать сгенерировать код, не совпадающий с активными
+MAX_GENERATE_ATTEMPTS = 20
+
+
+def generate_code(length: int) -> str:
+    """Случайный цифровой код заданной длины"""
+    return str(secrets.randbelow(10 ** length)).zfill(length)
+
+
+class CodeStoreFull(Exception):
+    """Не удалось выдать уникальный код"""
+
+
+class CodeStore(ABC):
+    """
+    Хранилище кодов привязки Telegram: код живет ttl секунд и
+    погашается ровно один раз
+    """
+
+    def __init__(self, ttl: int, max_size: int, length: int = 6):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.length = length
+
+    @abstractmethod
+    async def issue(self, telegram_id) -> str:
+        """Выдача нового кода; предыдущий код этого аккаунта аннулируется"""
+
+    @abstractmethod
+    async def consume(self, code: str, db: Optional[AsyncSession] = None) -> Optional[str]:
+        """
+        Атомарное погашение кода: возвращает Telegram ID или None.
+        Если передана сессия, погашение входит в ее транзакцию
+        """
+
+
+class MemoryCodeStore(CodeStore):
+    """
+    Коды в памяти процесса; подходит только для одного воркера.
+    Погашение не транзакционное: переданная сессия игнорируется
+    """
+
+    def __init__(self, ttl: int, max_size: int, length: int = 6):
+        super().__init__(ttl, max_size, length)
+        self._codes: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._by_telegram_id: dict = {}
+
+    def _remove(self, code: str) -> Optional[tuple]:
+        item = self._codes.pop(code, None)
+        if item is not None and self._by_telegram_id.get(item[1]) == code:
+            del self._by_telegram_id[item[1]]
+        return item
+
+    def _prune(self) -> None:
+        now = time.time()
+        # Коды добавляются по возрастанию срока, поэтому просроченные - в начале
+        while self._codes:
+            code, (expires_at, _) = next(iter(self._codes.items()))
+            if expires_at > now and len(self._codes) < self.max_size:
+                break
+            self._remove(code)
+
+    async def issue(self, telegram_id) -> str:
+        telegram_id = str(telegram_id)
+        self._prune()
+        previous = self._by_telegram_id.get(telegram_id)
+        if previous is not None:
+            self._remove(previous)
+
+        for _ in range(MAX_GENERATE_ATTEMPTS):
+            code = generate_code(self.length)
+            if code not in self._codes:
+                self._codes[code] = (time.time() + self.ttl, telegram_id)
+                self._by_telegram_id[telegram_id] = code
+                return code
+        raise CodeStoreFull()
+
+    async def consume(self, code: str, db: Optional[AsyncSession] = None) -> Optional[str]:
+        item = self._remove(code)
+        if item is None or item[0] <= time.time():
+            return None
+        return item[1]
+
+
+class DatabaseCodeStore(CodeStore):
+    """Коды в таблице telegram_connection_codes; общие для всех воркеров"""
+
+    async def issue(self, telegram_id) -> str:
+        telegram_id = str(telegram_id)
+        async with SessionLocal() as db:
+            now = datetime.utcnow()
+            await db.execute(
+                delete(ConnectionCode).where(
+                    (ConnectionCode.expires_at <= now) |
+                    (ConnectionCode.telegram_id == telegram_id)
+                )
+            )
+            await db.commit()
+
+            active = await db.scalar(select(func.count()).select_from(ConnectionCode))
+            if active >= self.max_size:
+                raise CodeStoreFull()
+
+            for _ in range(MAX_GENERATE_ATTEMPTS):
+                code = generate_code(self.length)
+                db.add(ConnectionCode(
+                    code=code,
+                    telegram_id=telegram_id,
+                    expires_at=now + timedelta(seconds=self.ttl)
+                ))
+                try:
+                    await db.commit()
+                    return code
+                except IntegrityError:
+                    # Такой код уже выдан - пробуем другой
+                    await db.rollback()
+        raise CodeStoreFull()
+
+    async def consume(self, code: str, db: Optional[AsyncSession] = None) -> Optional[str]:
+        stmt = (
+            delete(ConnectionCode)
+            .where(
+                ConnectionCode.code == code,
+                ConnectionCode.expires_at > datetime.utcnow()
+            )
+            .returning(ConnectionCode.telegram_id)
+        )
+        if db is not None:
+            return await db.scalar(stmt)
+
+        async with SessionLocal() as db:
+            telegram_id = await db.scalar(stmt)
+            await db.commit()
+            return telegram_id
+
+
+def create_code_store() -> CodeStore:
+    """Хранилище кодов по настройке CONNECTION_CODE_BACKEND"""
+    store_class = {
+        "memory": MemoryCodeStore,
+        "database": DatabaseCodeStore,
+    }[settings.CONNECTION_CODE_BACKEND]
+    return store_class(
+        ttl=settings.CONNECTION_CODE_TTL,
+        max_size=settings.CONNECTION_CODE_MAX_SIZE
+    )
+
+code_store = create_code_store()
@@ -1,19 +1,12 @@
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from ..database import SessionLocal
 from ..models.user import User
 
 router = Router()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        return db
-    finally:
-        db.close()
-
 @router.message(Command("start"))
 async def cmd_start(message: Message):
     await message.answer(
@@ -43,8 +36,11 @@ async def cmd_link(message: Message):
 
 @router.message(Command("status"))
 async def cmd_status(message: Message):
-    db = get_db()
-    user = db.query(User).filter(User.telegram_id == str(message.from_user.id)).first()
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(User).where(User.telegram_id == str(message.from_user.id))
+        )
+        user = result.scalar_one_or_none()
     
     if user:
         await message.answer(
@@ -1,7 +1,6 @@
 from pydantic import BaseModel, validator
 from dotenv import load_dotenv
 import os
-import time
 
 load_dotenv()
 
@@ -9,28 +8,187 @@ class Settings(BaseModel):
     DATABASE_URL: str | None = None
     SECRET_KEY: str
     TELEGRAM_BOT_TOKEN: str
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Пул процессов для хеширования паролей (0 - хешировать в текущем процессе)
+    HASH_POOL_WORKERS: int = os.cpu_count() or 1
+    # Максимум одновременных операций хеширования
+    HASH_MAX_CONCURRENCY: int = os.cpu_count() or 1
+    # Максимум операций, ожидающих свободного воркера
+    HASH_MAX_QUEUE: int = 64
+
+    # Кеш расшифрованных токенов и пользователей (0 - отключить)
+    TOKEN_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60
+
+    # Доставка сообщений в Telegram через outbox
+    OUTBOX_CONCURRENCY: int = 8
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_BACKOFF_BASE: float = 1.0
+    OUTBOX_BACKOFF_MAX: float = 300.0
+
+    # Лимиты отправки в Telegram (сообщений в секунду)
+    TELEGRAM_GLOBAL_RATE: float = 30.0
+    TELEGRAM_CHAT_RATE: float = 1.0
+    TELEGRAM_GROUP_RATE: float = 20 / 60
+    TELEGRAM_CHAT_BURST: float = 1.0
+
+    # Общий HTTP-транспорт к Bot API: размер пула соединений, keep-alive,
+    # таймаут запроса и время жизни DNS-кеша (секунды)
+    TELEGRAM_POOL_SIZE: int = 32
+    TELEGRAM_KEEPALIVE_SECONDS: float = 60.0
+    TELEGRAM_REQUEST_TIMEOUT: float = 60.0
+    TELEGRAM_DNS_CACHE_SECONDS: int = 300
+    # Адрес Bot API (свой сервер telegram-bot-api или эмулятор
+    # benchmarks.fake_telegram); по умолчанию https://api.telegram.org
+    TELEGRAM_API_URL: str | None = None
+
+    # Получение обновлений бота: polling, webhook или disabled
+    TELEGRAM_MODE: str = "polling"
+    # Публичный адрес API, на который Telegram будет слать обновления
+    TELEGRAM_WEBHOOK_URL: str | None = None
+    TELEGRAM_WEBHOOK_PATH: str = "/telegram/webhook"
+    TELEGRAM_WEBHOOK_SECRET: str | None = None
+
+    # Коды привязки Telegram: memory (один воркер) или database
+    CONNECTION_CODE_BACKEND: str = "database"
+    CONNECTION_CODE_TTL: int = 600
+    CONNECTION_CODE_MAX_SIZE: int = 100000
+
+    # Поток событий /messages/stream
+    STREAM_MAX_CONNECTIONS_PER_USER: int = 5
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+
+    # Шина событий между воркерами: auto, memory или postgres
+    BACKPLANE: str = "auto"
+    BACKPLANE_CHANNEL: str = "message_events"
+
+    # Интервал сверки счетчиков сообщений с историей, секунды (0 - выключено)
+    COUNTERS_RECONCILE_INTERVAL: float = 3600.0
+
+    # Максимум получателей в одной рассылке POST /messages/bulk
+    BULK_MAX_RECIPIENTS: int = 1000
+
+    # Время жизни кеша первых страниц каталога пользователей, секунды
+    USER_DIRECTORY_CACHE_TTL: int = 30
+
+    # Архивация: сообщения старше MESSAGE_ARCHIVE_AFTER_DAYS дней (0 - не
+    # архивировать, по умолчанию) переносятся в messages_archive пачками по
+    # MESSAGE_ARCHIVE_BATCH_SIZE раз в MESSAGE_ARCHIVE_INTERVAL секунд
+    # (0 - задача выключена). На Postgres та же задача заранее создает
+    # месячные секции messages на MESSAGE_PARTITIONS_AHEAD месяцев вперед
+    # и удаляет опустевшие старые. Архив не участвует в /messages/search,
+    # а в истории появляется только с archived=true
+    MESSAGE_ARCHIVE_AFTER_DAYS: int = 0
+    MESSAGE_ARCHIVE_INTERVAL: float = 3600.0
+    MESSAGE_ARCHIVE_BATCH_SIZE: int = 1000
+    MESSAGE_PARTITIONS_AHEAD: int = 3
+
+    # Логирование: уровень корневого логгера, уровни отдельных логгеров
+    # ("app.routes=DEBUG,aiogram=WARNING"), формат json или text, доля
+    # сохраняемых INFO/DEBUG записей ("app.routes.auth=0.1") и размер очереди
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLING: str = ""
+    LOG_QUEUE_SIZE: int = 10000
 
     @validator('DATABASE_URL')
     def validate_database_url(cls, v):
-        # Ждем установки DATABASE_URL максимум 30 секунд
-        timeout = 30
-        while not v and timeout > 0:
-            print(f"Waiting for DATABASE_URL... {timeout}s remaining")
-            v = os.getenv('DATABASE_URL')
-            if v:
-                break
-            time.sleep(1)
-            timeout -= 1
-            
         if not v:
             raise ValueError("DATABASE_URL must be set")
-            
+
         if v.startswith("postgres://"):
             return v.replace("postgres://", "postgresql://", 1)
         return v
 
+    @validator('TELEGRAM_MODE')
+    def validate_telegram_mode(cls, v):
+        if v not in ("polling", "webhook", "disabled"):
+            raise ValueError("TELEGRAM_MODE must be polling, webhook or disabled")
+        return v
+
+    @validator('CONNECTION_CODE_BACKEND')
+    def validate_connection_code_backend(cls, v):
+        if v not in ("memory", "database"):
+            raise ValueError("CONNECTION_CODE_BACKEND must be memory or database")
+        return v
+
+    @validator('LOG_FORMAT')
+    def validate_log_format(cls, v):
+        if v not in ("json", "text"):
+            raise ValueError("LOG_FORMAT must be json or text")
+        return v
+
+    @validator('BACKPLANE')
+    def validate_backplane(cls, v):
+        if v not in ("auto", "memory", "postgres"):
+            raise ValueError("BACKPLANE must be auto, memory or postgres")
+        return v
+
+    @validator('TELEGRAM_WEBHOOK_SECRET', always=True)
+    def validate_webhook_secret(cls, v, values):
+        if values.get('TELEGRAM_MODE') == "webhook":
+            if not v or not values.get('TELEGRAM_WEBHOOK_URL'):
+                raise ValueError(
+                    "TELEGRAM_WEBHOOK_URL and TELEGRAM_WEBHOOK_SECRET must be set in webhook mode"
+                )
+        return v
+
 settings = Settings(
     DATABASE_URL=os.getenv('DATABASE_URL'),
     SECRET_KEY=os.getenv('SECRET_KEY', 'your-secret-key'),
-    TELEGRAM_BOT_TOKEN=os.getenv('TELEGRAM_BOT_TOKEN')
+    TELEGRAM_BOT_TOKEN=os.getenv('TELEGRAM_BOT_TOKEN'),
+    ALGORITHM=os.getenv('ALGORITHM', 'HS256'),
+    ACCESS_TOKEN_EXPIRE_MINUTES=os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES', 30),
+    HASH_POOL_WORKERS=os.getenv('HASH_POOL_WORKERS', os.cpu_count() or 1),
+    HASH_MAX_CONCURRENCY=os.getenv('HASH_MAX_CONCURRENCY', os.cpu_count() or 1),
+    HASH_MAX_QUEUE=os.getenv('HASH_MAX_QUEUE', 64),
+    TOKEN_CACHE_SIZE=os.getenv('TOKEN_CACHE_SIZE', 10000),
+    PRINCIPAL_CACHE_SIZE=os.getenv('PRINCIPAL_CACHE_SIZE', 10000),
+    PRINCIPAL_CACHE_TTL=os.getenv('PRINCIPAL_CACHE_TTL', 60),
+    OUTBOX_CONCURRENCY=os.getenv('OUTBOX_CONCURRENCY', 8),
+    OUTBOX_MAX_ATTEMPTS=os.getenv('OUTBOX_MAX_ATTEMPTS', 8),
+    OUTBOX_POLL_INTERVAL=os.getenv('OUTBOX_POLL_INTERVAL', 1.0),
+    OUTBOX_LEASE_SECONDS=os.getenv('OUTBOX_LEASE_SECONDS', 60),
+    OUTBOX_BACKOFF_BASE=os.getenv('OUTBOX_BACKOFF_BASE', 1.0),
+    OUTBOX_BACKOFF_MAX=os.getenv('OUTBOX_BACKOFF_MAX', 300.0),
+    TELEGRAM_GLOBAL_RATE=os.getenv('TELEGRAM_GLOBAL_RATE', 30.0),
+    TELEGRAM_CHAT_RATE=os.getenv('TELEGRAM_CHAT_RATE', 1.0),
+    TELEGRAM_GROUP_RATE=os.getenv('TELEGRAM_GROUP_RATE', 20 / 60),
+    TELEGRAM_CHAT_BURST=os.getenv('TELEGRAM_CHAT_BURST', 1.0),
+    TELEGRAM_POOL_SIZE=os.getenv('TELEGRAM_POOL_SIZE', 32),
+    TELEGRAM_KEEPALIVE_SECONDS=os.getenv('TELEGRAM_KEEPALIVE_SECONDS', 60.0),
+    TELEGRAM_REQUEST_TIMEOUT=os.getenv('TELEGRAM_REQUEST_TIMEOUT', 60.0),
+    TELEGRAM_DNS_CACHE_SECONDS=os.getenv('TELEGRAM_DNS_CACHE_SECONDS', 300),
+    TELEGRAM_API_URL=os.getenv('TELEGRAM_API_URL') or None,
+    TELEGRAM_MODE=os.getenv('TELEGRAM_MODE', 'polling'),
+    TELEGRAM_WEBHOOK_URL=os.getenv('TELEGRAM_WEBHOOK_URL'),
+    TELEGRAM_WEBHOOK_PATH=os.getenv('TELEGRAM_WEBHOOK_PATH', '/telegram/webhook'),
+    TELEGRAM_WEBHOOK_SECRET=os.getenv('TELEGRAM_WEBHOOK_SECRET'),
+    CONNECTION_CODE_BACKEND=os.getenv('CONNECTION_CODE_BACKEND', 'database'),
+    CONNECTION_CODE_TTL=os.getenv('CONNECTION_CODE_TTL', 600),
+    CONNECTION_CODE_MAX_SIZE=os.getenv('CONNECTION_CODE_MAX_SIZE', 100000),
+    STREAM_MAX_CONNECTIONS_PER_USER=os.getenv('STREAM_MAX_CONNECTIONS_PER_USER', 5),
+    STREAM_QUEUE_SIZE=os.getenv('STREAM_QUEUE_SIZE', 100),
+    STREAM_HEARTBEAT_SECONDS=os.getenv('STREAM_HEARTBEAT_SECONDS', 15.0),
+    BACKPLANE=os.getenv('BACKPLANE', 'auto'),
+    BACKPLANE_CHANNEL=os.getenv('BACKPLANE_CHANNEL', 'message_events'),
+    COUNTERS_RECONCILE_INTERVAL=os.getenv('COUNTERS_RECONCILE_INTERVAL', 3600.0),
+    BULK_MAX_RECIPIENTS=os.getenv('BULK_MAX_RECIPIENTS', 1000),
+    USER_DIRECTORY_CACHE_TTL=os.getenv('USER_DIRECTORY_CACHE_TTL', 30),
+    MESSAGE_ARCHIVE_AFTER_DAYS=os.getenv('MESSAGE_ARCHIVE_AFTER_DAYS', 0),
+    MESSAGE_ARCHIVE_INTERVAL=os.getenv('MESSAGE_ARCHIVE_INTERVAL', 3600.0),
+    MESSAGE_ARCHIVE_BATCH_SIZE=os.getenv('MESSAGE_ARCHIVE_BATCH_SIZE', 1000),
+    MESSAGE_PARTITIONS_AHEAD=os.getenv('MESSAGE_PARTITIONS_AHEAD', 3),
+    LOG_LEVEL=os.getenv('LOG_LEVEL', 'INFO'),
+    LOG_LEVELS=os.getenv('LOG_LEVELS', ''),
+    LOG_FORMAT=os.getenv('LOG_FORMAT', 'json'),
+    LOG_SAMPLING=os.getenv('LOG_SAMPLING', ''),
+    LOG_QUEUE_SIZE=os.getenv('LOG_QUEUE_SIZE', 10000),
 ) 
\ No newline at end of file
@@ -0,0 +1,144 @@
+from typing import Optional, Sequence
+from sqlalchemy import and_, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .backplane import backplane
+from .counters import record_counters
+from .database import get_insert
+from .models.conversation import Conversation
+from .models.archive import ArchivedMessage
+from .models.message import Message
+from .models.user import User
+from .search import index_messages
+
+async def record_messages(db: AsyncSession, messages: Sequence[Message]) -> None:
+    """
+    Обновление списка диалогов для новых сообщений.
+
+    Вызывается в той же транзакции, что и вставка сообщений (после flush,
+    чтобы были известны id): одна upsert-вставка на все затронутые пары.
+    Здесь же обновляются счетчики сообщений (см. record_counters),
+    поисковый индекс и готовятся события для других воркеров (см.
+    backplane.stage_messages); после коммита вызывающий публикует их
+    через backplane.publish_messages.
+    """
+    await record_counters(db, messages)
+    await index_messages(db, messages)
+    await backplane.stage_messages(db, messages)
+
+    rows = {}
+    for message in messages:
+        # (пользователь, собеседник, входящее)
+        sides = [(message.sender_id, message.recipient_id, 0)]
+        if message.recipient_id != message.sender_id:
+            sides.append((message.recipient_id, message.sender_id, 1))
+
+        for user_id, peer_id, incoming in sides:
+            row = rows.get((user_id, peer_id))
+            if row is None:
+                row = rows[(user_id, peer_id)] = {
+                    "user_id": user_id,
+                    "peer_id": peer_id,
+                    "unread_count": 0,
+                    "version": 0,
+                    "sent_count": 0,
+                    "received_count": 0,
+                }
+            row["last_message_id"] = message.id
+            row["last_message_at"] = message.created_at
+            row["unread_count"] += incoming
+            row["version"] += 1
+            row["received_count" if incoming else "sent_count"] += 1
+
+    if not rows:
+        return
+
+    insert = get_insert(db)
+    stmt = insert(Conversation).values([rows[key] for key in sorted(rows)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Conversation.user_id, Conversation.peer_id],
+        set_={
+            "last_message_id": stmt.excluded.last_message_id,
+            "last_message_at": stmt.excluded.last_message_at,
+            "unread_count": Conversation.unread_count + stmt.excluded.unread_count,
+            "version": Conversation.version + stmt.excluded.version,
+            "sent_count": Conversation.sent_count + stmt.excluded.sent_count,
+            "received_count": Conversation.received_count + stmt.excluded.received_count,
+        },
+    )
+    await db.execute(stmt)
+
+async def touch_conversation(db: AsyncSession, sender_id: int, recipient_id: int) -> None:
+    """
+    Увеличение версии диалога с обеих сторон после изменения сообщения
+    """
+    await db.execute(
+        update(Conversation)
+        .where(
+            tuple_(Conversation.user_id, Conversation.peer_id).in_([
+                (sender_id, recipient_id),
+                (recipient_id, sender_id),
+            ])
+        )
+        .values(version=Conversation.version + 1)
+    )
+
+async def mailbox_version(
+    db: AsyncSession,
+    user_id: int,
+    peer_id: Optional[int] = None
+) -> int:
+    """
+    Версия всей переписки пользователя или диалога с одним собеседником:
+    сумма версий диалогов, меняется при любом новом или измененном сообщении
+    """
+    stmt = select(func.coalesce(func.sum(Conversation.version), 0)).where(
+        Conversation.user_id == user_id
+    )
+    if peer_id is not None:
+        stmt = stmt.where(Conversation.peer_id == peer_id)
+    return await db.scalar(stmt)
+
+async def list_conversations(db: AsyncSession, user_id: int, limit: int) -> list:
+    """
+    Диалоги пользователя от последних к старым: один запрос по индексу
+    (user_id, last_message_at). Текст последнего сообщения берется из
+    архива, если сообщение уже перенесено; created_at в условии
+    соединения оставляет на Postgres одну секцию messages
+    """
+    result = await db.execute(
+        select(Conversation, User.username, func.coalesce(Message.content, ArchivedMessage.content))
+        .join(User, User.id == Conversation.peer_id)
+        .outerjoin(Message, and_(
+            Message.id == Conversation.last_message_id,
+            Message.created_at == Conversation.last_message_at,
+        ))
+        .outerjoin(ArchivedMessage, ArchivedMessage.id == Conversation.last_message_id)
+        .where(Conversation.user_id == user_id)
+        .order_by(Conversation.last_message_at.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "peer_id": conversation.peer_id,
+            "peer_username": username,
+            "last_message_id": conversation.last_message_id,
+            "last_message": content,
+            "last_message_at": conversation.last_message_at,
+            "unread_count": conversation.unread_count,
+        }
+        for conversation, username, content in result.all()
+    ]
+
+async def mark_read(db: AsyncSession, user_id: int, peer_id: int) -> bool:
+    """
+    Перенос курсора прочтения на последнее сообщение диалога
+    """
+    result = await db.execute(
+        update(Conversation)
+        .where(Conversation.user_id == user_id, Conversation.peer_id == peer_id)
+        .values(
+            unread_count=0,
+            last_read_message_id=Conversation.last_message_id,
+        )
+    )
+    return result.rowcount > 0
@@ -0,0 +1,376 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Date, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .database import SessionLocal, dispose_engine, get_engine, get_insert
+from .models.conversation import Conversation
+from .models.counters import MessageCounter, MessageDailyCounter
+from .models.message import Message
+from .archive import message_history
+from .models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock: сверку одновременно выполняет только один воркер
+RECONCILE_LOCK_ID = 7_301_013
+
+Counts = Dict[object, List[int]]
+
+
+def _deltas(messages: Sequence[Message]) -> Tuple[Counts, Counts]:
+    """Приращения (отправлено, получено) по пользователям и по (пользователь, день)"""
+    totals: Counts = defaultdict(lambda: [0, 0])
+    daily: Counts = defaultdict(lambda: [0, 0])
+    for message in messages:
+        day = message.created_at.date()
+        totals[message.sender_id][0] += 1
+        daily[(message.sender_id, day)][0] += 1
+        if message.recipient_id != message.sender_id:
+            totals[message.recipient_id][1] += 1
+            daily[(message.recipient_id, day)][1] += 1
+    return totals, daily
+
+
+async def record_counters(db: AsyncSession, messages: Sequence[Message]) -> None:
+    """
+    Увеличение счетчиков пользователя и дневных счетчиков для новых сообщений.
+
+    Вызывается из record_messages первой: строка message_counters служит
+    блокировкой пользователя, которую берет и сверка. Строки блокируются
+    по возрастанию user_id, чтобы параллельные вставки не взаимоблокировались.
+    """
+    totals, daily = _deltas(messages)
+    if not totals:
+        return
+
+    insert = get_insert(db)
+    stmt = insert(MessageCounter).values([
+        {"user_id": user_id, "sent_count": sent, "received_count": received}
+        for user_id, (sent, received) in sorted(totals.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MessageCounter.user_id],
+        set_={
+            "sent_count": MessageCounter.sent_count + stmt.excluded.sent_count,
+            "received_count": MessageCounter.received_count + stmt.excluded.received_count,
+        },
+    )
+    await db.execute(stmt)
+
+    stmt = insert(MessageDailyCounter).values([
+        {"user_id": user_id, "day": day, "sent_count": sent, "received_count": received}
+        for (user_id, day), (sent, received) in sorted(daily.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MessageDailyCounter.user_id, MessageDailyCounter.day],
+        set_={
+            "sent_count": MessageDailyCounter.sent_count + stmt.excluded.sent_count,
+            "received_count": MessageDailyCounter.received_count + stmt.excluded.received_count,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def message_stats(db: AsyncSession, user_id: int, days: int, peers: int) -> dict:
+    """
+    Статистика из счетчиков: итоги, последние days дней и peers последних
+    диалогов. Три запроса по первичным ключам/индексам, не зависящие от
+    размера истории
+    """
+    totals = (await db.execute(
+        select(MessageCounter.sent_count, MessageCounter.received_count)
+        .where(MessageCounter.user_id == user_id)
+    )).first()
+    sent, received = totals if totals is not None else (0, 0)
+
+    first_day = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = await db.execute(
+        select(MessageDailyCounter)
+        .where(MessageDailyCounter.user_id == user_id, MessageDailyCounter.day >= first_day)
+        .order_by(MessageDailyCounter.day)
+    )
+    by_peer = await db.execute(
+        select(Conversation, User.username)
+        .join(User, User.id == Conversation.peer_id)
+        .where(Conversation.user_id == user_id)
+        .order_by(Conversation.last_message_at.desc())
+        .limit(peers)
+    )
+
+    return {
+        "total_messages": sent + received,
+        "sent": sent,
+        "received": received,
+        "daily": [
+            {"day": row.day.isoformat(), "sent": row.sent_count, "received": row.received_count}
+            for row in daily.scalars().all()
+        ],
+        "peers": [
+            {
+                "peer_id": conversation.peer_id,
+                "peer_username": username,
+                "sent": conversation.sent_count,
+                "received": conversation.received_count,
+            }
+            for conversation, username in by_peer.all()
+        ],
+    }
+
+
+async def _observed_counts(db: AsyncSession, user_id: int) -> Tuple[Counts, Counts]:
+    """
+    Хранимые и ожидаемые по истории (вместе с архивом) счетчики
+    пользователя: ключи - "total", ("peer", peer_id) и ("day", день),
+    значения - [отправлено, получено]. Сначала хранимые, затем ожидаемые
+    """
+    stored: Counts = defaultdict(lambda: [0, 0])
+    row = (await db.execute(
+        select(MessageCounter.sent_count, MessageCounter.received_count)
+        .where(MessageCounter.user_id == user_id)
+    )).first()
+    if row is not None:
+        stored["total"] = list(row)
+    for peer_id, sent, received in (await db.execute(
+        select(Conversation.peer_id, Conversation.sent_count, Conversation.received_count)
+        .where(Conversation.user_id == user_id)
+    )).all():
+        stored[("peer", peer_id)] = [sent, received]
+    for value, sent, received in (await db.execute(
+        select(MessageDailyCounter.day, MessageDailyCounter.sent_count, MessageDailyCounter.received_count)
+        .where(MessageDailyCounter.user_id == user_id)
+    )).all():
+        stored[("day", value)] = [sent, received]
+
+    expected: Counts = defaultdict(lambda: [0, 0])
+    expected["total"] = [0, 0]
+    history = message_history("sender_id", "recipient_id", "created_at").c
+    for column, peer, condition in (
+        (0, history.recipient_id, history.sender_id == user_id),
+        (1, history.sender_id, (history.recipient_id == user_id) & (history.sender_id != user_id)),
+    ):
+        result = await db.execute(select(peer, func.count()).where(condition).group_by(peer))
+        for peer_id, count in result.all():
+            expected["total"][column] += count
+            # Счетчики есть только у существующих диалогов
+            if ("peer", peer_id) in stored:
+                expected[("peer", peer_id)][column] = count
+
+        day = func.date(history.created_at, type_=Date)
+        result = await db.execute(
+            select(day, func.count()).where(condition, history.created_at.isnot(None)).group_by(day)
+        )
+        for value, count in result.all():
+            expected[("day", value)][column] = count
+    return stored, expected
+
+
+async def reconcile_user(user_id: int) -> int:
+    """
+    Пересчет счетчиков пользователя по истории (вместе с архивом);
+    возвращает число исправлений.
+
+    Подсчет идет без блокировок счетчиков, в одном снимке (REPEATABLE READ
+    на Postgres): хранимые счетчики и история видны на один момент, и их
+    разница - накопленное расхождение, а не сообщения, вставленные во время
+    подсчета. Разница прибавляется к счетчикам отдельной короткой
+    транзакцией, как приращения record_counters, поэтому вставки,
+    закоммиченные после снимка, не теряются, а отправка сообщений ждет
+    только эту транзакцию.
+    """
+    async with SessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        else:
+            # В SQLite снимок дает только транзакция, начатая записью;
+            # писатель в SQLite все равно один
+            await db.execute(
+                get_insert(db)(MessageCounter)
+                .values(user_id=user_id, sent_count=0, received_count=0)
+                .on_conflict_do_nothing(index_elements=[MessageCounter.user_id])
+            )
+        stored, expected = await _observed_counts(db, user_id)
+        await db.commit()
+
+    deltas = {
+        key: [expected[key][0] - stored[key][0], expected[key][1] - stored[key][1]]
+        for key in set(stored) | set(expected)
+    }
+    deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+    if not deltas:
+        return 0
+
+    async with SessionLocal() as db:
+        insert = get_insert(db)
+        # Тот же порядок блокировок, что в record_messages: счетчики,
+        # дневные счетчики, диалоги
+        if "total" in deltas:
+            sent, received = deltas["total"]
+            stmt = insert(MessageCounter).values(user_id=user_id, sent_count=sent, received_count=received)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[MessageCounter.user_id],
+                set_={
+                    "sent_count": MessageCounter.sent_count + stmt.excluded.sent_count,
+                    "received_count": MessageCounter.received_count + stmt.excluded.received_count,
+                },
+            ))
+
+        days = sorted(key[1] for key in deltas if key != "total" and key[0] == "day")
+        if days:
+            stmt = insert(MessageDailyCounter).values([
+                {
+                    "user_id": user_id,
+                    "day": value,
+                    "sent_count": deltas[("day", value)][0],
+                    "received_count": deltas[("day", value)][1],
+                }
+                for value in days
+            ])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[MessageDailyCounter.user_id, MessageDailyCounter.day],
+                set_={
+                    "sent_count": MessageDailyCounter.sent_count + stmt.excluded.sent_count,
+                    "received_count": MessageDailyCounter.received_count + stmt.excluded.received_count,
+                },
+            ))
+            # Дни без сообщений в истории
+            await db.execute(
+                delete(MessageDailyCounter).where(
+                    MessageDailyCounter.user_id == user_id,
+                    MessageDailyCounter.day.in_(days),
+                    MessageDailyCounter.sent_count == 0,
+                    MessageDailyCounter.received_count == 0,
+                )
+            )
+
+        peers = sorted(key[1] for key in deltas if key != "total" and key[0] == "peer")
+        for peer_id in peers:
+            sent, received = deltas[("peer", peer_id)]
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.user_id == user_id, Conversation.peer_id == peer_id)
+                .values(
+                    sent_count=Conversation.sent_count + sent,
+                    received_count=Conversation.received_count + received,
+                )
+            )
+        await db.commit()
+
+    return len(deltas)
+
+
+class CounterReconciler:
+    """
+    Периодическая сверка счетчиков с историей сообщений: исправляет
+    расхождения после ручных правок БД, сбоев и т.п. Каждый пользователь
+    сверяется отдельно: подсчет без блокировок, исправление - в короткой
+    транзакции.
+    """
+
+    def __init__(self, interval: float, batch_size: int = 500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.runs = 0
+        self.users_checked = 0
+        self.corrected = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration = 0.0
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запуск фоновой задачи (interval <= 0 - сверка отключена)"""
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception("Error reconciling message counters")
+
+    async def run_once(self) -> int:
+        """Одна сверка всех пользователей; возвращает число исправлений"""
+        engine = get_engine()
+        if engine.dialect.name != "postgresql":
+            return await self._reconcile_all()
+
+        async with engine.connect() as conn:
+            locked = await conn.scalar(select(func.pg_try_advisory_lock(RECONCILE_LOCK_ID)))
+            await conn.commit()
+            if not locked:
+                return 0
+            try:
+                return await self._reconcile_all()
+            finally:
+                await conn.execute(select(func.pg_advisory_unlock(RECONCILE_LOCK_ID)))
+                await conn.commit()
+
+    async def _reconcile_all(self) -> int:
+        started = time.monotonic()
+        self.running = True
+        corrected = 0
+        last_id = 0
+        try:
+            while True:
+                async with SessionLocal() as db:
+                    user_ids = (await db.scalars(
+                        select(User.id).where(User.id > last_id).order_by(User.id).limit(self.batch_size)
+                    )).all()
+                if not user_ids:
+                    break
+                for user_id in user_ids:
+                    corrected += await reconcile_user(user_id)
+                    self.users_checked += 1
+                last_id = user_ids[-1]
+        finally:
+            self.running = False
+            self.runs += 1
+            self.corrected += corrected
+            self.last_run_at = datetime.utcnow()
+            self.last_duration = time.monotonic() - started
+        if corrected:
+            logger.warning("Message counters drifted", extra={"corrections": corrected})
+        return corrected
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "users_checked": self.users_checked,
+            "corrected": self.corrected,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_seconds": round(self.last_duration, 3),
+        }
+
+
+counter_reconciler = CounterReconciler(interval=settings.COUNTERS_RECONCILE_INTERVAL)
+
+
+if __name__ == "__main__":
+    # Разовая сверка: python -m app.counters
+    from .log import setup_logging, shutdown_logging
+
+    async def main():
+        corrected = await counter_reconciler.run_once()
+        logger.info("Message counters reconciled", extra={"corrections": corrected})
+        await dispose_engine()
+
+    setup_logging()
+    asyncio.run(main())
+    shutdown_logging()
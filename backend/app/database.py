@@ -1,15 +1,66 @@
-from sqlalchemy import create_engine
+from typing import Optional
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Асинхронные драйверы для поддерживаемых СУБД
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    """
+    Преобразование DATABASE_URL в URL с асинхронным драйвером
+    """
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ASYNC_DRIVERS:
+        return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+    return url
+
+_engine: Optional[AsyncEngine] = None
+
+def get_engine() -> AsyncEngine:
+    """
+    Движок БД. Создается при первом обращении (обычно в lifespan
+    приложения), поэтому импорт модулей не подключает драйвер
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(get_async_database_url(settings.DATABASE_URL))
+    return _engine
+
+async def dispose_engine() -> None:
+    """Закрытие пула соединений; следующий get_engine создаст движок заново"""
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+class LazySessionMaker(async_sessionmaker):
+    """Фабрика сессий, которая привязывается к движку при создании сессии"""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        local_kw.setdefault("bind", get_engine())
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionMaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
+
+def get_insert(db: AsyncSession):
+    """
+    insert() текущего диалекта: у Postgres и SQLite есть on_conflict_do_update
+    """
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
@@ -1,14 +1,71 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from typing import Optional
+from .cache import TTLCache
+from .config import settings
 from .database import get_db
 from .models.user import User
 from .security import verify_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Кеш пользователей по username: значения колонок строки users
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL
+)
+
+def cache_principal(user: User) -> None:
+    """Сохранение пользователя в кеше"""
+    principal_cache.set(user.username, {
+        column.key: getattr(user, column.key)
+        for column in User.__table__.columns
+    })
+
+def invalidate_principal(*usernames: Optional[str]) -> None:
+    """Сброс кеша пользователя после изменения его данных"""
+    for username in usernames:
+        if username:
+            principal_cache.pop(username)
+
+def _load_cached_principal(db: AsyncSession, username: str) -> Optional[User]:
+    """Восстановление пользователя из кеша и привязка к сессии без SELECT"""
+    principal = principal_cache.get(username)
+    if principal is None:
+        return None
+
+    user = User(**principal)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+async def authenticate(db: AsyncSession, token: Optional[str]) -> Optional[User]:
+    """
+    Пользователь по JWT токену или None. Используется и там, где
+    HTTP-зависимости недоступны (WebSocket)
+    """
+    if not token:
+        return None
+
+    token_data = verify_token(token)
+    if token_data is None:
+        return None
+
+    user = _load_cached_principal(db, token_data.username)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(User).where(User.username == token_data.username))
+    user = result.scalar_one_or_none()
+    if user is not None:
+        cache_principal(user)
+    return user
+
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """Получение текущего пользователя по токену"""
@@ -18,14 +75,9 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token_data = verify_token(token)
-    if token_data is None:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = await authenticate(db, token)
     if user is None:
         raise credentials_exception
-        
     return user
 
 async def get_current_active_user(
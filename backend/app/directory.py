@@ -0,0 +1,118 @@
+import base64
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
+from .config import settings
+from .models.user import User
+
+# Поиск по username начинается с префиксного поиска; на Postgres запрос
+# от TRIGRAM_MIN_LENGTH символов ищет и подстроку по триграммному индексу
+TRIGRAM_MIN_LENGTH = 3
+
+# Первые страницы каталога без запроса (их чаще всего открывает выбор
+# получателя); ключ - (telegram_only, limit)
+directory_cache = TTLCache(maxsize=64, ttl=settings.USER_DIRECTORY_CACHE_TTL)
+
+UserCursor = Tuple[str, int]
+
+# lower() в SQLite: меняется регистр только A-Z
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def username_key(dialect: str):
+    """
+    Ключ сортировки и поиска: lower(username), на Postgres в collation "C",
+    чтобы префикс был диапазоном индекса ix_users_username_lower.
+    lower() в SQLite меняет регистр только латиницы, поэтому там имена на
+    других алфавитах ищутся с учетом регистра (см. fold_query)
+    """
+    key = func.lower(User.username)
+    if dialect == "postgresql":
+        key = key.collate("C")
+    return key
+
+
+def fold_query(q: str, dialect: str) -> str:
+    """
+    Запрос в том же регистре, что и username_key: на SQLite приводится
+    только латиница, иначе "Ив" превратилось бы в "ив" и не нашло "Иван"
+    """
+    if dialect == "sqlite":
+        return q.translate(_ASCII_LOWER)
+    return q.lower()
+
+
+def encode_user_cursor(key: str, user_id: int) -> str:
+    """Курсор пользователя: ключ сортировки (как его вычислила БД) и id"""
+    raw = f"{key}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_user_cursor(cursor: str) -> UserCursor:
+    """Разбор курсора; ValueError если курсор некорректный"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, _, user_id = base64.urlsafe_b64decode(padded).decode().rpartition("|")
+        return key, int(user_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def search_users(
+    db: AsyncSession,
+    q: str,
+    limit: int,
+    cursor: Optional[UserCursor] = None,
+    telegram_only: bool = False,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Страница каталога пользователей по возрастанию username: совпадение
+    по началу имени без учета регистра (на SQLite - только для латиницы,
+    на Postgres - и по подстроке для запросов от TRIGRAM_MIN_LENGTH
+    символов). Возвращает пользователей и курсор следующей страницы
+    """
+    dialect = db.bind.dialect.name
+    q = fold_query(q.strip(), dialect)
+    cache_key = (telegram_only, limit)
+    if not q and cursor is None:
+        cached = directory_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    key = username_key(dialect)
+    stmt = select(User.id, User.username, User.telegram_id, key.label("key"))
+    if q and dialect == "postgresql" and len(q) >= TRIGRAM_MIN_LENGTH:
+        stmt = stmt.where(func.lower(User.username).like(f"%{_escape_like(q)}%", escape="\\"))
+    elif q:
+        # Все строки с префиксом q лежат в [q, q + максимальный символ)
+        stmt = stmt.where(key >= q, key < q + "\U0010ffff")
+    if telegram_only:
+        stmt = stmt.where(User.telegram_id.isnot(None))
+    if cursor is not None:
+        last_key, last_id = cursor
+        stmt = stmt.where(or_(key > last_key, and_(key == last_key, User.id > last_id)))
+
+    result = await db.execute(stmt.order_by(key, User.id).limit(limit + 1))
+    rows = result.all()
+    users = [
+        {"id": row.id, "username": row.username, "telegram_connected": row.telegram_id is not None}
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_user_cursor(last.key, last.id)
+
+    if not q and cursor is None:
+        directory_cache.set(cache_key, (users, next_cursor))
+    return users, next_cursor
+
+
+def invalidate_directory() -> None:
+    """Сброс кеша после регистрации, смены имени или привязки Telegram"""
+    directory_cache.clear()
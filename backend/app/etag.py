@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из частей версии (пользователь, версия переписки и т.д.)"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с If-None-Match (слабое сравнение, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Условный GET: ответ 304, если у клиента актуальная версия, иначе
+    ETag выставляется в заголовки обычного ответа и возвращается None
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
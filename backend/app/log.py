@@ -0,0 +1,150 @@
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from .config import settings
+
+# Атрибуты LogRecord, которые не являются полями из extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def parse_mapping(value: str) -> Dict[str, str]:
+    """Разбор настройки вида "app.routes=DEBUG,aiogram=WARNING" """
+    result = {}
+    for item in value.split(","):
+        name, sep, setting = item.partition("=")
+        if sep and name.strip():
+            result[name.strip()] = setting.strip()
+    return result
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Сэмплирование частых событий: для логгера (и его потомков) из rates
+    пропускается только доля записей уровня INFO и ниже. Предупреждения
+    и ошибки не отбрасываются никогда; в запись добавляется sample_rate
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Обработчик, который только кладет запись в ограниченную очередь.
+    Вывод делает фоновый поток QueueListener; при переполнении очереди
+    запись отбрасывается, а не блокирует обработчик запроса
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # В отличие от QueueHandler.prepare, поля extra и исключение остаются
+        # отдельными, форматирование целиком делается в потоке вывода
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def setup_logging() -> None:
+    """
+    Настройка логирования приложения: корневой логгер пишет в очередь,
+    поток QueueListener выводит записи в stdout (JSON или текст)
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    rates = {name: float(rate) for name, rate in parse_mapping(settings.LOG_SAMPLING).items()}
+    if rates:
+        _handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(settings.LOG_LEVEL)
+    for name, level in parse_mapping(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(_handler.queue, output)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Вывод оставшихся записей и остановка потока логирования"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        # Дальше (например, при завершении процесса) пишем синхронно
+        logging.getLogger().handlers = list(_listener.handlers)
+        _listener = None
+
+
+def logging_stats() -> dict:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
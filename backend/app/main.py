@@ -1,27 +1,24 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 import asyncio
-from .routes import auth, users, messages, test
-from .database import engine
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.middleware.cors import CORSMiddleware
+from .routes import auth, users, messages, test, webhook
+from .database import dispose_engine, get_engine
 from .bot import start_bot, stop_bot
-from .models import user, message
-
-# Создаем таблицы в базе данных
-user.Base.metadata.create_all(bind=engine)
-message.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="Telegram Web Messenger API",
-    description="API для веб-мессенджера с интеграцией Telegram",
-    version="1.0.0",
-    # Добавляем теги для группировки эндпоинтов в документации
-    openapi_tags=[
-        {"name": "auth", "description": "Операции аутентификации"},
-        {"name": "users", "description": "Операции с пользователями"},
-        {"name": "messages", "description": "Операции с сообщениями"},
-        {"name": "debug", "description": "Отладочные эндпоинты"},
-    ]
-)
+from .security import password_hasher, PasswordHasherBusy
+from .outbox import outbox_dispatcher
+from .backplane import backplane
+from .counters import counter_reconciler
+from .archive import message_archiver
+from .transport import telegram_transport
+from .log import setup_logging, shutdown_logging, logging_stats
+from .metrics import MetricsMiddleware, instrument_engine, registry
+from .realtime import hub
+from .security import token_cache
+
+logger = logging.getLogger(__name__)
 
 # Настройка CORS
 origins = [
@@ -34,42 +31,132 @@ origins = [
     "https://reasonable-empathy-production.up.railway.app"
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Подключаем роуты
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(messages.router)
-app.include_router(test.router)
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to Telegram Web Messenger API"}
 
-@app.on_event("startup")
-async def startup_event():
+def runtime_metrics() -> dict:
+    """Текущие значения фоновых компонентов для /metrics"""
+    return {
+        "stream_connections": hub.stats()["connections"],
+        "outbox_in_flight": outbox_dispatcher.stats()["in_flight"],
+        "password_hasher_pending": password_hasher.pending,
+        "telegram_connections_reused_total": telegram_transport.connections_reused,
+        "telegram_connections_created_total": telegram_transport.connections_created,
+        "token_cache_hits_total": token_cache.hits,
+        "token_cache_misses_total": token_cache.misses,
+        "log_records_dropped_total": logging_stats()["dropped"],
+        "messages_archived_total": message_archiver.archived,
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    Запуск бота при старте приложения
+    Ресурсы приложения: движок БД, пул хеширования, фоновые задачи и бот
+    создаются при старте и освобождаются при остановке. Схему БД создает
+    и обновляет только Alembic (alembic upgrade head)
     """
+    async with AsyncExitStack() as stack:
+        # Каждый компонент регистрирует свою остановку сразу после запуска:
+        # если следующий не запустится, уже запущенные остановятся в
+        # обратном порядке, а при штатной остановке порядок тот же
+        setup_logging()
+        stack.callback(shutdown_logging)
+        stack.push_async_callback(dispose_engine)
+        instrument_engine(get_engine().sync_engine)
+
+        password_hasher.start()
+        stack.callback(password_hasher.shutdown)
+        stack.push_async_callback(telegram_transport.close)
+        outbox_dispatcher.start()
+        stack.push_async_callback(outbox_dispatcher.stop)
+        counter_reconciler.start()
+        stack.push_async_callback(counter_reconciler.stop)
+        message_archiver.start()
+        stack.push_async_callback(message_archiver.stop)
+        await backplane.start()
+        stack.push_async_callback(backplane.stop)
+
+        bot_task = asyncio.create_task(start_bot())
+        stack.push_async_callback(_stop_bot, bot_task)
+        logger.info("Bot started")
+
+        yield
+
+
+async def _stop_bot(bot_task: asyncio.Task) -> None:
     try:
-        asyncio.create_task(start_bot())
-        print("Bot started successfully")
+        await stop_bot()
+        # Long polling сам не завершается - останавливаем задачу
+        bot_task.cancel()
+        await asyncio.gather(bot_task, return_exceptions=True)
+        logger.info("Bot stopped")
     except Exception as e:
-        print(f"Error starting bot: {e}")
+        logger.exception("Error stopping bot")
 
-@app.on_event("shutdown")
-async def shutdown_event():
+
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
     """
-    Остановка бота при завершении работы приложения
+    Сервер перегружен запросами на регистрацию/вход
     """
-    try:
-        await stop_bot()
-        print("Bot stopped successfully")
-    except Exception as e:
-        print(f"Error stopping bot: {e}")
\ No newline at end of file
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many authentication requests, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def root():
+    return {"message": "Welcome to Telegram Web Messenger API"}
+
+
+async def metrics():
+    """
+    Метрики в формате Prometheus
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def create_app() -> FastAPI:
+    """
+    Сборка приложения без обращений к БД и сети: все подключения
+    открываются в lifespan
+    """
+    app = FastAPI(
+        title="Telegram Web Messenger API",
+        description="API для веб-мессенджера с интеграцией Telegram",
+        version="1.0.0",
+        lifespan=lifespan,
+        # Добавляем теги для группировки эндпоинтов в документации
+        openapi_tags=[
+            {"name": "auth", "description": "Операции аутентификации"},
+            {"name": "users", "description": "Операции с пользователями"},
+            {"name": "messages", "description": "Операции с сообщениями"},
+            {"name": "debug", "description": "Отладочные эндпоинты"},
+        ]
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "ETag", "Server-Timing", "Content-Disposition"],
+    )
+    # Метрики - внешний слой, чтобы учитывать и CORS, и обработку ошибок
+    app.add_middleware(MetricsMiddleware)
+    registry.add_collector(runtime_metrics)
+
+    # Подключаем роуты
+    app.include_router(auth.router)
+    app.include_router(users.router)
+    app.include_router(messages.router)
+    app.include_router(test.router)
+    app.include_router(webhook.router)
+
+    app.add_exception_handler(PasswordHasherBusy, password_hasher_busy_handler)
+    app.add_api_route("/", root, methods=["GET"])
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    return app
+
+
+app = create_app()
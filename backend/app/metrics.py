@@ -0,0 +1,235 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from weakref import WeakSet
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Границы корзин гистограмм (секунды и штуки)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], le: Optional[str] = None) -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Счетчик Prometheus с метками"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками: корзины, сумма и количество"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики по корзинам (+Inf последняя), сумма]
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        data = self._values.get(labels)
+        if data is None:
+            data = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        data[0][bisect_left(self.buckets, value)] += 1
+        data[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, labels, str(bound))} {cumulative}"
+                )
+            cumulative += counts[-1]
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labels, labels, '+Inf')} {cumulative}"
+            )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Набор метрик и функций, добавляющих текущие значения (gauge)"""
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        """collector возвращает {имя_метрики: значение} для gauge без меток"""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status",
+    ("method", "route", "status"),
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route"),
+))
+http_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "Database queries per HTTP request by route",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS,
+))
+http_db_time = registry.register(Histogram(
+    "http_request_db_seconds", "Database time per HTTP request by route",
+    ("method", "route"),
+))
+db_queries = registry.register(Counter(
+    "db_queries_total", "Database queries, including background tasks",
+))
+db_query_latency = registry.register(Histogram(
+    "db_query_duration_seconds", "Database query latency",
+))
+telegram_latency = registry.register(Histogram(
+    "telegram_request_duration_seconds", "Bot API call latency by method and outcome",
+    ("method", "outcome"),
+))
+
+
+class RequestStats:
+    """Запросы к БД в рамках одного HTTP-запроса"""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+# Движки, на которые уже подписаны обработчики событий
+_instrumented: "WeakSet[Engine]" = WeakSet()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Подсчет запросов и времени БД через события SQLAlchemy. Для async
+    движка передается engine.sync_engine; события выполняются в контексте
+    вызывающей задачи, поэтому запросы относятся к текущему HTTP-запросу.
+    Повторный вызов для того же движка ничего не делает
+    """
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_queries.inc()
+        db_query_latency.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: задержка и статусы по шаблону маршрута (а не по
+    фактическому пути, чтобы число меток не росло), число запросов к БД
+    и время БД на запрос. Итог запроса также отдается в Server-Timing
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'.encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            http_requests.inc(method, path, str(status_code))
+            http_latency.observe(time.perf_counter() - started, method, path)
+            http_db_queries.observe(stats.queries, method, path)
+            http_db_time.observe(stats.db_time, method, path)
@@ -1,3 +1,8 @@
 from .user import User
 from .message import Message
-from ..database import Base 
\ No newline at end of file
+from .archive import ArchivedMessage
+from .conversation import Conversation
+from .counters import MessageCounter, MessageDailyCounter
+from .outbox import TelegramOutbox
+from .connection_code import ConnectionCode
+from ..database import Base
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
+from datetime import datetime
+from ..database import Base
+
+class ArchivedMessage(Base):
+    """
+    Архив сообщений: строки, перенесенные из messages фоновой архивацией
+    (см. app/archive.py). Колонки те же, что у messages, и id сохраняется,
+    поэтому архивные сообщения отдаются теми же схемами и курсорами
+    """
+    __tablename__ = "messages_archive"
+    __table_args__ = (
+        Index("ix_messages_archive_sender_created", "sender_id", "created_at", "id"),
+        Index("ix_messages_archive_recipient_created", "recipient_id", "created_at", "id"),
+        Index("ix_messages_archive_sender_recipient_created", "sender_id", "recipient_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    content = Column(String)
+    created_at = Column(DateTime)
+    sender_id = Column(Integer, ForeignKey("users.id"))
+    recipient_id = Column(Integer, ForeignKey("users.id"))
+    telegram_message_id = Column(String, nullable=True)
+    is_bot_message = Column(Boolean, default=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from ..database import Base
+
+class ConnectionCode(Base):
+    """
+    Одноразовый код привязки Telegram аккаунта, выданный ботом
+    """
+    __tablename__ = "telegram_connection_codes"
+
+    code = Column(String, primary_key=True)
+    telegram_id = Column(String, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
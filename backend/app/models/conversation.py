@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from ..database import Base
+
+class Conversation(Base):
+    """
+    Денормализованный список диалогов: одна строка на пару
+    (пользователь, собеседник), обновляется при каждой вставке сообщения
+    """
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_user_last_message", "user_id", "last_message_at"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    peer_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_message_id = Column(Integer, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    # Курсор прочтения: последнее прочитанное пользователем сообщение
+    last_read_message_id = Column(Integer, nullable=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+    # Версия переписки: растет при новых сообщениях и изменении старых
+    # (доставка в Telegram), по ней считается ETag истории
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Счетчики сообщений в диалоге с точки зрения user_id
+    sent_count = Column(Integer, default=0, server_default="0", nullable=False)
+    received_count = Column(Integer, default=0, server_default="0", nullable=False)
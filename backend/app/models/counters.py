@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from ..database import Base
+
+class MessageCounter(Base):
+    """
+    Счетчики сообщений пользователя, обновляются в транзакции вставки
+    сообщений и сверяются с историей фоновой задачей
+    """
+    __tablename__ = "message_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    sent_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Полученные от других пользователей (сообщения себе считаются отправленными)
+    received_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+class MessageDailyCounter(Base):
+    """
+    Счетчики сообщений пользователя по дням (UTC)
+    """
+    __tablename__ = "message_daily_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    sent_count = Column(Integer, default=0, server_default="0", nullable=False)
+    received_count = Column(Integer, default=0, server_default="0", nullable=False)
@@ -1,10 +1,27 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, DDL, Integer, String, DateTime, ForeignKey, Boolean, Index, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
 
 class Message(Base):
+    """
+    Оперативная история сообщений. На Postgres таблица секционирована по
+    месяцам created_at (миграция 0010, секции ведет app/archive.py), на
+    SQLite - обычная таблица. Старые сообщения переносятся в
+    messages_archive (см. ArchivedMessage).
+
+    На Postgres первичный ключ таблицы - (id, created_at), как того требует
+    секционирование; модель объявляет ключом только id (SQLite выдает id
+    лишь одиночному INTEGER PRIMARY KEY), этого достаточно ORM, так как id
+    уникален. Поэтому схему создают только миграции, не create_all
+    """
     __tablename__ = "messages"
+    __table_args__ = (
+        # Индексы под keyset-пагинацию истории по (created_at, id)
+        Index("ix_messages_sender_created", "sender_id", "created_at", "id"),
+        Index("ix_messages_recipient_created", "recipient_id", "created_at", "id"),
+        Index("ix_messages_sender_recipient_created", "sender_id", "recipient_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String)
@@ -16,4 +33,31 @@ class Message(Base):
 
     # Отношения
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
-    recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
\ No newline at end of file
+    recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
+
+# Полнотекстовый поиск (см. app/search.py): на Postgres - вычисляемая
+# колонка tsvector с GIN-индексом, на SQLite - таблица FTS5 с внешним
+# содержимым, которую заполняет record_messages. Для существующих баз
+# то же делает миграция 0008
+SEARCH_CONFIG = "simple"
+FTS_TABLE = "messages_fts"
+
+SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE messages ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{SEARCH_CONFIG}', coalesce(content, ''))) STORED",
+        "CREATE INDEX ix_messages_search ON messages USING gin (search_vector)",
+    ],
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(content, content='messages', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    ],
+}
+
+for dialect, statements in SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+event.listen(
+    Message.__table__, "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime
+from ..database import Base
+
+class TelegramOutbox(Base):
+    """
+    Очередь исходящих сообщений в Telegram. Строка пишется в одной
+    транзакции с сообщением и удаляется после успешной доставки
+    """
+    __tablename__ = "telegram_outbox"
+    __table_args__ = (
+        Index("ix_telegram_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, nullable=True)
+    chat_id = Column(String, nullable=False)
+    text = Column(String, nullable=False)
+    # pending - ждет отправки, failed - попытки исчерпаны
+    status = Column(String, default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, DDL, Integer, String, Boolean, event
 from sqlalchemy.orm import relationship
 from ..database import Base
 
@@ -14,4 +14,16 @@ class User(Base):
 
     # Отношения
     sent_messages = relationship("Message", foreign_keys="Message.sender_id", back_populates="sender")
-    received_messages = relationship("Message", foreign_keys="Message.recipient_id", back_populates="recipient")
\ No newline at end of file
+    received_messages = relationship("Message", foreign_keys="Message.recipient_id", back_populates="recipient")
+
+# Индекс каталога пользователей (см. app/directory.py): lower(username)
+# для поиска по префиксу и сортировки, на Postgres в collation "C".
+# Триграммный индекс для поиска по подстроке требует pg_trgm и
+# создается миграцией 0009
+USERNAME_INDEX_DDL = {
+    "postgresql": 'CREATE INDEX ix_users_username_lower ON users (lower(username) COLLATE "C", id)',
+    "sqlite": "CREATE INDEX ix_users_username_lower ON users (lower(username), id)",
+}
+
+for dialect, statement in USERNAME_INDEX_DDL.items():
+    event.listen(User.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
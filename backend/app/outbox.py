@@ -0,0 +1,288 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .bot.bot import bot
+from .config import settings
+from .conversations import touch_conversation
+from .database import SessionLocal
+from .models.message import Message
+from .models.outbox import TelegramOutbox
+
+logger = logging.getLogger(__name__)
+
+def enqueue(
+    db: AsyncSession,
+    chat_id: str,
+    text: str,
+    message_id: Optional[int] = None
+) -> TelegramOutbox:
+    """
+    Постановка сообщения в очередь на отправку. Коммит делает вызывающий,
+    после коммита стоит вызвать outbox_dispatcher.notify()
+    """
+    item = TelegramOutbox(chat_id=str(chat_id), text=text, message_id=message_id)
+    db.add(item)
+    return item
+
+async def outbox_stats(db: AsyncSession) -> dict:
+    """
+    Глубина очереди и возраст самой старой неотправленной записи
+    """
+    result = await db.execute(
+        select(
+            TelegramOutbox.status,
+            func.count(TelegramOutbox.id),
+            func.min(TelegramOutbox.created_at)
+        ).group_by(TelegramOutbox.status)
+    )
+    stats = {"pending": 0, "failed": 0, "oldest_pending_age_seconds": None}
+    for status, count, oldest in result.all():
+        stats[status] = count
+        if status == "pending" and oldest is not None:
+            stats["oldest_pending_age_seconds"] = round(
+                (datetime.utcnow() - oldest).total_seconds(), 3
+            )
+    return stats
+
+
+class OutboxDispatcher:
+    """
+    Фоновая доставка записей outbox в Telegram.
+
+    Записи забираются пачками под SELECT ... FOR UPDATE SKIP LOCKED и
+    сдвигаются на lease секунд вперед, поэтому несколько воркеров не
+    отправляют одно и то же сообщение, а запись, взятая упавшим воркером,
+    снова станет доступной. Пока запись ждет лимитер или ответ Telegram,
+    lease продлевается, чтобы ее не забрал другой воркер. Одновременно
+    отправляется не больше concurrency сообщений.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_attempts: int,
+        poll_interval: float,
+        lease_seconds: int,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+
+    def start(self) -> None:
+        """Запуск фоновой задачи"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка; недоставленные записи останутся в очереди"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._in_flight):
+            task.cancel()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def notify(self) -> None:
+        """Разбудить диспетчер после коммита новых записей"""
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            free = self.concurrency - len(self._in_flight)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await self._claim(free)
+                except Exception as e:
+                    logger.exception("Error claiming outbox items")
+
+            for item in claimed:
+                task = asyncio.create_task(self._deliver(item))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+
+            # Ждем новую запись, освобождение слота или следующий опрос
+            wakeup = asyncio.create_task(self._wakeup.wait())
+            try:
+                await asyncio.wait(
+                    [wakeup, *self._in_flight],
+                    timeout=self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                wakeup.cancel()
+
+    async def _claim(self, limit: int) -> list:
+        now = datetime.utcnow()
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(TelegramOutbox)
+                .where(
+                    TelegramOutbox.status == "pending",
+                    TelegramOutbox.next_attempt_at <= now
+                )
+                .order_by(TelegramOutbox.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            items = result.scalars().all()
+            if not items:
+                return []
+
+            lease_until = now + timedelta(seconds=self.lease_seconds)
+            for item in items:
+                item.next_attempt_at = lease_until
+                item.attempts += 1
+            await db.commit()
+            return items
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    async def _deliver(self, item: TelegramOutbox) -> None:
+        try:
+            await self._send(item)
+        except Exception as e:
+            # Запись вернется в работу по истечении lease
+            logger.exception("Error processing outbox item", extra={"outbox_id": item.id})
+
+    async def _hold_lease(self, item: TelegramOutbox) -> None:
+        """Продление lease записи каждую треть его длительности"""
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with SessionLocal() as db:
+                    await db.execute(
+                        update(TelegramOutbox)
+                        .where(TelegramOutbox.id == item.id, TelegramOutbox.status == "pending")
+                        .values(next_attempt_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.exception("Error extending outbox lease", extra={"outbox_id": item.id})
+
+    async def _send_message(self, item: TelegramOutbox):
+        """
+        Отправка с продлением lease: после 429 лимитер может держать
+        запись дольше lease, и без продления ее заберет и отправит
+        повторно другой воркер
+        """
+        lease = asyncio.create_task(self._hold_lease(item))
+        try:
+            return await bot.send_message(chat_id=item.chat_id, text=item.text)
+        finally:
+            lease.cancel()
+            await asyncio.gather(lease, return_exceptions=True)
+
+    async def _send(self, item: TelegramOutbox) -> None:
+        try:
+            sent = await self._send_message(item)
+        except TelegramRetryAfter as e:
+            await self._reschedule(item, e.retry_after, str(e), count_attempt=False)
+        except (TelegramServerError, TelegramNetworkError) as e:
+            await self._reschedule(item, self._backoff(item.attempts), str(e))
+        except TelegramAPIError as e:
+            # Ошибки запроса (неверный чат, бот заблокирован) не исправятся повтором
+            await self._fail(item, str(e))
+        except Exception as e:
+            await self._reschedule(item, self._backoff(item.attempts), str(e))
+        else:
+            await self._complete(item, str(sent.message_id))
+
+    async def _complete(self, item: TelegramOutbox, telegram_message_id: str) -> None:
+        async with SessionLocal() as db:
+            await db.execute(delete(TelegramOutbox).where(TelegramOutbox.id == item.id))
+            if item.message_id is not None:
+                result = await db.execute(
+                    update(Message)
+                    .where(Message.id == item.message_id)
+                    .values(telegram_message_id=telegram_message_id)
+                    .returning(Message.sender_id, Message.recipient_id)
+                )
+                row = result.first()
+                if row is not None:
+                    # Сообщение изменилось - сбрасываем ETag истории
+                    await touch_conversation(db, row.sender_id, row.recipient_id)
+            await db.commit()
+        self.delivered += 1
+
+    async def _reschedule(
+        self,
+        item: TelegramOutbox,
+        delay: float,
+        error: str,
+        count_attempt: bool = True
+    ) -> None:
+        attempts = item.attempts if count_attempt else item.attempts - 1
+        if attempts >= self.max_attempts:
+            await self._fail(item, error)
+            return
+
+        async with SessionLocal() as db:
+            await db.execute(
+                update(TelegramOutbox)
+                .where(TelegramOutbox.id == item.id)
+                .values(
+                    attempts=attempts,
+                    next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                    last_error=error[:1000]
+                )
+            )
+            await db.commit()
+        self.retried += 1
+
+    async def _fail(self, item: TelegramOutbox, error: str) -> None:
+        logger.warning("Telegram delivery failed", extra={"outbox_id": item.id, "error": error})
+        async with SessionLocal() as db:
+            await db.execute(
+                update(TelegramOutbox)
+                .where(TelegramOutbox.id == item.id)
+                .values(status="failed", last_error=error[:1000])
+            )
+            await db.commit()
+        self.failed += 1
+
+
+outbox_dispatcher = OutboxDispatcher(
+    concurrency=settings.OUTBOX_CONCURRENCY,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    backoff_base=settings.OUTBOX_BACKOFF_BASE,
+    backoff_max=settings.OUTBOX_BACKOFF_MAX,
+)
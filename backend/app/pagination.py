@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import Select, and_, or_, select, union_all
+from sqlalchemy.orm import aliased
+
+from .archive import message_columns
+from .models.archive import ArchivedMessage
+from .models.message import Message
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(message: Message) -> str:
+    """Курсор сообщения: позиция (created_at, id) в base64"""
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Разбор курсора; ValueError если курсор некорректный"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _older_than(cursor: Cursor, entity=Message):
+    created_at, message_id = cursor
+    return or_(
+        entity.created_at < created_at,
+        and_(entity.created_at == created_at, entity.id < message_id),
+    )
+
+
+def _newer_than(cursor: Cursor, entity=Message):
+    created_at, message_id = cursor
+    return or_(
+        entity.created_at > created_at,
+        and_(entity.created_at == created_at, entity.id > message_id),
+    )
+
+
+def history_page_query(
+    conditions: Sequence,
+    limit: int,
+    before: Optional[Cursor] = None,
+    after: Optional[Cursor] = None,
+    archived: Sequence = (),
+) -> Select:
+    """
+    Запрос страницы истории сообщений.
+
+    Каждое условие из conditions (например "я отправитель" и "я получатель")
+    выбирается отдельной веткой со своим LIMIT, чтобы каждая ветка шла
+    по своему составному индексу (..., created_at, id). Ветки объединяются
+    через UNION ALL и обрезаются до limit.
+
+    Без курсора и с before строки идут от новых к старым, с after - от
+    старых к новым (ближайшие к курсору), порядок разворачивает вызывающий.
+
+    archived - те же условия для ArchivedMessage: архивные ветки
+    добавляются в тот же UNION ALL, и архив листается теми же курсорами.
+    """
+    ascending = after is not None
+
+    def order(entity):
+        if ascending:
+            return entity.created_at.asc(), entity.id.asc()
+        return entity.created_at.desc(), entity.id.desc()
+
+    branches = []
+    for entity, entity_conditions in ((Message, conditions), (ArchivedMessage, archived)):
+        for condition in entity_conditions:
+            stmt = select(*message_columns(entity)).where(condition)
+            if before is not None:
+                stmt = stmt.where(_older_than(before, entity))
+            if after is not None:
+                stmt = stmt.where(_newer_than(after, entity))
+            stmt = stmt.order_by(*order(entity)).limit(limit)
+            branches.append(select(stmt.subquery()))
+
+    page = union_all(*branches).subquery()
+    row = aliased(Message, page)
+    return select(row).order_by(*order(row)).limit(limit)
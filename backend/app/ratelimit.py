@@ -0,0 +1,173 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from .config import settings
+
+# Методы Bot API, которые отправляют сообщения в чат. sendChatAction
+# (индикатор "печатает") сообщением не считается и лимит не расходует
+SENDING_METHODS = frozenset({
+    "sendMessage", "sendPhoto", "sendAudio", "sendDocument", "sendVideo",
+    "sendAnimation", "sendVoice", "sendVideoNote", "sendMediaGroup",
+    "sendLocation", "sendVenue", "sendContact", "sendPoll", "sendDice",
+    "sendSticker", "sendInvoice", "sendGame", "copyMessage", "forwardMessage",
+})
+
+
+class TokenBucket:
+    """
+    Token bucket с очередью ожидания.
+
+    Ожидающие вызовы обслуживаются строго по очереди (asyncio.Lock
+    справедлив), поэтому при перегрузке запросы не падают, а ждут свой слот.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def idle(self) -> bool:
+        """Бакет полон и никто не ждет - его можно удалить"""
+        self._refill(time.monotonic())
+        return not self._lock.locked() and self.tokens >= self.capacity
+
+    async def acquire(self) -> float:
+        """Получение одного токена; возвращает время ожидания в секундах"""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return time.monotonic() - started
+                if delay <= 0:
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+
+    def block(self, seconds: float) -> None:
+        """Пауза после ответа 429 от Telegram"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class TelegramRateLimiter:
+    """
+    Общий лимитер отправки в Telegram: глобальный бюджет сообщений в
+    секунду и отдельные бюджеты на каждый чат (для групп - свой).
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        group_rate: float,
+        chat_burst: float = 1,
+        max_chats: int = 10000,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+        self.requests = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._chats: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            # Отрицательные id - группы и каналы, у них лимит строже
+            rate = self.group_rate if key.startswith("-") else self.chat_rate
+            bucket = self._chats[key] = TokenBucket(rate, self.chat_burst)
+            self._prune()
+        self._chats.move_to_end(key)
+        return bucket
+
+    def _prune(self) -> None:
+        if len(self._chats) <= self.max_chats:
+            return
+        for key in list(self._chats):
+            if len(self._chats) <= self.max_chats:
+                break
+            if self._chats[key].idle:
+                del self._chats[key]
+
+    async def acquire(self, chat_id=None) -> float:
+        """
+        Ожидание слота для отправки в чат. Сначала берется токен чата,
+        потом глобальный, чтобы ожидание одного чата не занимало общий бюджет
+        """
+        waited = 0.0
+        if chat_id is not None:
+            waited += await self._chat_bucket(chat_id).acquire()
+        waited += await self.global_bucket.acquire()
+
+        self.requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 0.001:
+            self.delayed += 1
+        return waited
+
+    def penalize(self, chat_id, retry_after: float) -> None:
+        """Учет ответа 429: чат (или весь бот) ждет retry_after секунд"""
+        if chat_id is not None:
+            self._chat_bucket(chat_id).block(retry_after)
+        else:
+            self.global_bucket.block(retry_after)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "total_wait_seconds": round(self.total_wait, 3),
+            "avg_wait_seconds": round(self.total_wait / self.requests, 4) if self.requests else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "tracked_chats": len(self._chats),
+        }
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии aiogram: все отправки любого Bot проходят через
+    общий лимитер
+    """
+
+    def __init__(self, limiter: TelegramRateLimiter):
+        self.limiter = limiter
+
+    async def __call__(self, make_request, bot, method):
+        chat_id: Optional[object] = getattr(method, "chat_id", None)
+        limited = method.__api_method__ in SENDING_METHODS
+        if limited:
+            await self.limiter.acquire(chat_id)
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            if limited:
+                self.limiter.penalize(chat_id, e.retry_after)
+            raise
+
+
+telegram_rate_limiter = TelegramRateLimiter(
+    global_rate=settings.TELEGRAM_GLOBAL_RATE,
+    chat_rate=settings.TELEGRAM_CHAT_RATE,
+    group_rate=settings.TELEGRAM_GROUP_RATE,
+    chat_burst=settings.TELEGRAM_CHAT_BURST,
+)
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+from .config import settings
+from .models.message import Message
+from .schemas.message import Message as MessageSchema
+
+
+class TooManyConnections(Exception):
+    """Превышен лимит подключений пользователя"""
+
+
+class Subscription:
+    """
+    Подписка одного подключения (WebSocket или SSE) на события пользователя.
+
+    Если клиент не успевает читать и очередь переполняется, подписка
+    закрывается: очередь очищается и в нее кладется None. Клиент
+    переподключается и догружает пропущенное через историю (after-курсор).
+    """
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.lagging = False
+
+    def push(self, event: dict) -> bool:
+        """Добавление события без ожидания; False если подписчик отстал"""
+        if self.lagging:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.lagging = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Следующее событие; None - подписка закрыта; TimeoutError по таймауту"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class MessageHub:
+    """
+    Внутрипроцессная рассылка событий подключенным клиентам
+    """
+
+    def __init__(self, max_connections_per_user: int, queue_size: int):
+        self.max_connections_per_user = max_connections_per_user
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscriptions = self._subscribers.setdefault(user_id, set())
+        if len(subscriptions) >= self.max_connections_per_user:
+            raise TooManyConnections()
+        subscription = Subscription(user_id, self.queue_size)
+        subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, *user_ids: int) -> bool:
+        """Есть ли у этого процесса подключения кого-то из пользователей"""
+        return any(user_id in self._subscribers for user_id in user_ids)
+
+    def publish(self, user_ids: Iterable[int], event: dict) -> None:
+        """Отправка события всем подключениям указанных пользователей"""
+        self.published += 1
+        for user_id in set(user_ids):
+            for subscription in list(self._subscribers.get(user_id, ())):
+                if not subscription.push(event):
+                    self.dropped += 1
+                    self.unsubscribe(subscription)
+
+    def publish_message(self, message: Message) -> None:
+        """Событие о новом сообщении для отправителя и получателя"""
+        self.publish(
+            [message.sender_id, message.recipient_id],
+            {
+                "type": "message",
+                "message": MessageSchema.model_validate(message).model_dump(mode="json"),
+            }
+        )
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "dropped_slow_consumers": self.dropped,
+        }
+
+
+hub = MessageHub(
+    max_connections_per_user=settings.STREAM_MAX_CONNECTIONS_PER_USER,
+    queue_size=settings.STREAM_QUEUE_SIZE,
+)
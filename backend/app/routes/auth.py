@@ -1,39 +1,46 @@
+import logging
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any
 
 from ..database import get_db
 from ..models.user import User
 from ..schemas.user import UserCreate, User as UserSchema
 from ..schemas.token import Token
-from ..security import verify_password, get_password_hash, create_access_token
+from ..security import password_hasher, create_access_token
 from ..config import settings
 from ..deps import get_current_active_user
+from ..directory import invalidate_directory
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=UserSchema)
-async def register(user_in: UserCreate, db: Session = Depends(get_db)):
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Регистрация нового пользователя.
     """
-    print(f"Attempting to register user: {user_in.username}")
+    logger.debug("Registration attempt", extra={"username": user_in.username})
     
     # Проверяем, существует ли пользователь с таким email
-    user = db.query(User).filter(User.email == user_in.email).first()
+    result = await db.execute(select(User).where(User.email == user_in.email))
+    user = result.scalar_one_or_none()
     if user:
-        print(f"Email {user_in.email} already registered")
+        logger.info("Registration rejected: email already registered", extra={"username": user_in.username})
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Проверяем, существует ли пользователь с таким username
-    user = db.query(User).filter(User.username == user_in.username).first()
+    result = await db.execute(select(User).where(User.username == user_in.username))
+    user = result.scalar_one_or_none()
     if user:
-        print(f"Username {user_in.username} already taken")
+        logger.info("Registration rejected: username already taken", extra={"username": user_in.username})
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
@@ -43,19 +50,20 @@ async def register(user_in: UserCreate, db: Session = Depends(get_db)):
     db_user = User(
         email=user_in.email,
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await password_hasher.hash(user_in.password),
         is_active=True
     )
     
     try:
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        print(f"Successfully registered user: {user_in.username}")
+        await db.commit()
+        await db.refresh(db_user)
+        invalidate_directory()
+        logger.info("User registered", extra={"username": user_in.username, "user_id": db_user.id})
         return db_user
     except Exception as e:
-        db.rollback()
-        print(f"Error registering user: {str(e)}")
+        await db.rollback()
+        logger.exception("Error registering user", extra={"username": user_in.username})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -63,18 +71,19 @@ async def register(user_in: UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/token", response_model=Token)
 async def login(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 совместимый токен для логина JWT
     """
-    print(f"Login attempt for user: {form_data.username}")
+    logger.debug("Login attempt", extra={"username": form_data.username})
     
     # Пытаемся найти пользователя по username
-    user = db.query(User).filter(User.username == form_data.username).first()
+    result = await db.execute(select(User).where(User.username == form_data.username))
+    user = result.scalar_one_or_none()
     if not user:
-        print(f"User not found: {form_data.username}")
+        logger.info("Login failed: unknown user", extra={"username": form_data.username})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -82,8 +91,8 @@ async def login(
         )
     
     # Проверяем пароль
-    if not verify_password(form_data.password, user.hashed_password):
-        print(f"Invalid password for user: {form_data.username}")
+    if not await password_hasher.verify(form_data.password, user.hashed_password):
+        logger.info("Login failed: invalid password", extra={"username": form_data.username})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -97,7 +106,7 @@ async def login(
         expires_delta=access_token_expires
     )
     
-    print(f"Login successful for user: {form_data.username}")
+    logger.info("Login successful", extra={"username": user.username, "user_id": user.id})
     return {
         "access_token": access_token,
         "token_type": "bearer"
@@ -111,9 +120,16 @@ async def test_token(current_user: User = Depends(get_current_active_user)) -> A
     return current_user
 
 @router.get("/users", tags=["debug"])
-def get_all_users(db: Session = Depends(get_db)):
+async def get_all_users(
+    after_id: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Временный эндпоинт для отладки
+    Временный эндпоинт для отладки: пользователи постранично по id
     """
-    users = db.query(User).all()
+    result = await db.execute(
+        select(User).where(User.id > after_id).order_by(User.id).limit(limit)
+    )
+    users = result.scalars().all()
     return [{"id": user.id, "username": user.username, "email": user.email} for user in users]
\ No newline at end of file
@@ -1,26 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from ..config import settings
+from ..database import get_db, SessionLocal
 from ..models.user import User
 from ..models.message import Message
-from ..schemas.message import MessageCreate, Message as MessageSchema
-from ..deps import get_current_active_user
-from ..bot.bot import bot  # Импортируем бота
+from ..models.archive import ArchivedMessage
+from ..schemas.message import (
+    BulkSendResponse,
+    MessageBulkCreate,
+    MessageCreate,
+    MessageSearchPage,
+    MessageSync,
+    Message as MessageSchema,
+)
+from ..schemas.conversation import Conversation as ConversationSchema
+from ..conversations import list_conversations, mailbox_version, mark_read, record_messages
+from ..counters import message_stats
+from ..deps import authenticate, get_current_active_user
+from ..etag import conditional, make_etag
+from ..pagination import Cursor, decode_cursor, encode_cursor, history_page_query
+from ..outbox import enqueue, outbox_dispatcher
+from ..search import search_messages
+from ..directory import search_users
+from ..serialization import FastJSONResponse, list_response, message_serializer, wants_ndjson
+from ..export import EXPORT_MEDIA_TYPES, export_messages, export_query
+from ..backplane import backplane
+from ..realtime import hub, TooManyConnections
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
+# Размер страницы истории по умолчанию и максимальный
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+async def get_history_page(
+    db: AsyncSession,
+    response: Response,
+    conditions: list,
+    limit: int,
+    before: Optional[str],
+    after: Optional[str],
+    archived: list = (),
+) -> List[Message]:
+    """
+    Страница истории (от новых к старым) с курсорами в заголовках:
+    X-Next-Cursor - для загрузки более старых сообщений (before),
+    X-Prev-Cursor - для загрузки более новых сообщений (after).
+    archived - условия для архива, если история нужна вместе с ним
+    """
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after cursor"
+        )
+    try:
+        before_cursor = decode_cursor(before) if before else None
+        after_cursor = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    result = await db.execute(
+        history_page_query(conditions, limit, before=before_cursor, after=after_cursor, archived=archived)
+    )
+    messages = list(result.scalars().all())
+    if after_cursor is not None:
+        messages.reverse()
+
+    if messages:
+        response.headers["X-Prev-Cursor"] = encode_cursor(messages[0])
+        if len(messages) == limit or after_cursor is not None:
+            response.headers["X-Next-Cursor"] = encode_cursor(messages[-1])
+    return messages
+
 @router.post("", response_model=MessageSchema)
 async def send_message(
     message: MessageCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Отправка сообщения пользователю
     """
     # Проверяем существование получателя
-    recipient = db.query(User).filter(User.id == message.recipient_id).first()
+    recipient = await db.get(User, message.recipient_id)
     if not recipient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -34,111 +108,504 @@ async def send_message(
         recipient_id=message.recipient_id
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.flush()
+    await record_messages(db, [db_message])
 
-    # Если у получателя есть Telegram ID, отправляем сообщение через бота
+    # Если у получателя есть Telegram ID, ставим сообщение в очередь на
+    # отправку; telegram_message_id заполнит диспетчер после доставки
     if recipient.telegram_id:
-        try:
-            telegram_message = await bot.send_message(
-                chat_id=recipient.telegram_id,
-                text=f"Сообщение от {current_user.username}:\n{message.content}"
-            )
-            # Сохраняем ID сообщения из Telegram
-            db_message.telegram_message_id = str(telegram_message.message_id)
-            db.commit()
-        except Exception as e:
-            print(f"Error sending telegram message: {e}")
-            # Не выбрасываем исключение, так как сообщение уже сохранено в БД
+        enqueue(
+            db,
+            chat_id=recipient.telegram_id,
+            text=f"Сообщение от {current_user.username}:\n{message.content}",
+            message_id=db_message.id
+        )
+
+    await db.commit()
+    await db.refresh(db_message)
+    if recipient.telegram_id:
+        outbox_dispatcher.notify()
+    await backplane.publish_message(db_message)
 
     return db_message
 
+@router.post("/bulk", response_model=BulkSendResponse)
+async def send_bulk_message(
+    payload: MessageBulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Рассылка одного сообщения нескольким получателям. Получатели ищутся
+    одним запросом, сообщения и записи outbox вставляются пачкой в одной
+    транзакции, доставку в Telegram параллельно ведет диспетчер outbox
+    """
+    recipient_ids = list(dict.fromkeys(payload.recipient_ids))
+    if len(recipient_ids) > settings.BULK_MAX_RECIPIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many recipients, maximum is {settings.BULK_MAX_RECIPIENTS}"
+        )
+
+    result = await db.execute(
+        select(User.id, User.telegram_id).where(User.id.in_(recipient_ids))
+    )
+    telegram_ids = dict(result.all())
+    found = [recipient_id for recipient_id in recipient_ids if recipient_id in telegram_ids]
+
+    messages = []
+    queued = set()
+    if found:
+        # Один multi-row INSERT ... RETURNING в порядке получателей
+        messages = (await db.scalars(
+            insert(Message).returning(Message, sort_by_parameter_order=True),
+            [
+                {
+                    "content": payload.content,
+                    "sender_id": current_user.id,
+                    "recipient_id": recipient_id,
+                }
+                for recipient_id in found
+            ]
+        )).all()
+        await record_messages(db, messages)
+
+        text = f"Сообщение от {current_user.username}:\n{payload.content}"
+        for db_message in messages:
+            telegram_id = telegram_ids[db_message.recipient_id]
+            if telegram_id:
+                enqueue(db, chat_id=telegram_id, text=text, message_id=db_message.id)
+                queued.add(db_message.recipient_id)
+
+        await db.commit()
+        if queued:
+            outbox_dispatcher.notify()
+        await backplane.publish_messages(messages)
+
+    message_ids = {db_message.recipient_id: db_message.id for db_message in messages}
+    results = [
+        {
+            "recipient_id": recipient_id,
+            "status": "sent" if recipient_id in message_ids else "not_found",
+            "message_id": message_ids.get(recipient_id),
+            "telegram_queued": recipient_id in queued,
+        }
+        for recipient_id in recipient_ids
+    ]
+    return {
+        "sent": len(messages),
+        "failed": len(recipient_ids) - len(messages),
+        "results": results,
+    }
+
+def page_etag(request: Request, *parts) -> str:
+    """
+    ETag страницы истории: версия переписки, параметры страницы и формат
+    ответа (JSON или NDJSON, ответ отдается с Vary: Accept)
+    """
+    return make_etag(*parts, "ndjson" if wants_ndjson(request) else "json")
+
+def mailbox_conditions(user_id: int, entity=Message) -> list:
+    """Ветки запроса всех сообщений пользователя: отправленные и полученные"""
+    return [
+        entity.sender_id == user_id,
+        (entity.recipient_id == user_id) & (entity.sender_id != user_id),
+    ]
+
+def chat_conditions(user_id: int, peer_id: int, entity=Message) -> list:
+    """Ветки запроса переписки с собеседником: в одну и в другую сторону"""
+    conditions = [(entity.sender_id == user_id) & (entity.recipient_id == peer_id)]
+    if peer_id != user_id:
+        conditions.append((entity.sender_id == peer_id) & (entity.recipient_id == user_id))
+    return conditions
+
 @router.get("", response_model=List[MessageSchema])
 async def get_messages(
+    request: Request,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    archived: bool = False,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Получение всех сообщений текущего пользователя
+    Получение сообщений текущего пользователя постранично.
+    С archived=true в историю входят и перенесенные в архив сообщения.
+    Поддерживает If-None-Match: без изменений отвечает 304.
+    С Accept: application/x-ndjson отдает поток NDJSON
     """
-    messages = db.query(Message).filter(
-        (Message.sender_id == current_user.id) | 
-        (Message.recipient_id == current_user.id)
-    ).order_by(Message.created_at.desc()).all()
-    return messages
+    # Версию читаем до выборки: новое сообщение между запросами только
+    # даст лишний 200, но не зафиксирует старые данные под новым ETag
+    version = await mailbox_version(db, current_user.id)
+    not_modified = conditional(request, response, page_etag(
+        request, current_user.id, version, before or "", after or "", limit, int(archived)
+    ))
+    if not_modified is not None:
+        return not_modified
+
+    messages = await get_history_page(
+        db, response, mailbox_conditions(current_user.id), limit, before, after,
+        archived=mailbox_conditions(current_user.id, ArchivedMessage) if archived else (),
+    )
+    return list_response(request, response, messages)
+
+def parse_since(value: str) -> Union[int, datetime]:
+    """since: id сообщения (0 - с начала) или время в ISO 8601 (без зоны - UTC)"""
+    if value.isdigit():
+        return int(value)
+    if value[-1:] in ("Z", "z"):
+        # datetime.fromisoformat до Python 3.11 не понимает суффикс Z из RFC 3339
+        value = value[:-1] + "+00:00"
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be a message id or an ISO 8601 timestamp"
+        )
+    return to_utc(moment)
+
+def to_utc(moment: datetime) -> datetime:
+    """Время с зоной - в UTC без зоны, как в БД; без зоны считается UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+@router.get("/sync", response_model=MessageSync)
+async def sync_messages(
+    request: Request,
+    response: Response,
+    since: str,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    archived: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Инкрементальная синхронизация: сообщения новее since (от старых к
+    новым) и high_water_mark для следующего запроса. Если has_more,
+    нужно сразу запросить следующую порцию. С archived=true в выборку
+    входит и архив (полная синхронизация с since=0)
+    """
+    version = await mailbox_version(db, current_user.id)
+    not_modified = conditional(
+        request, response, make_etag(current_user.id, version, since, limit, int(archived))
+    )
+    if not_modified is not None:
+        return not_modified
+
+    position = parse_since(since)
+    if position == 0:
+        # Первая синхронизация - с самого начала
+        cursor: Cursor = (datetime.min, 0)
+    elif isinstance(position, int):
+        created_at = await db.scalar(
+            select(Message.created_at).where(Message.id == position)
+        )
+        if created_at is None:
+            # Сообщение могло уйти в архив
+            created_at = await db.scalar(
+                select(ArchivedMessage.created_at).where(ArchivedMessage.id == position)
+            )
+        if created_at is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unknown message id in since"
+            )
+        cursor = (created_at, position)
+    else:
+        # Сообщения с created_at >= since
+        cursor = (position, 0)
+
+    result = await db.execute(
+        history_page_query(
+            mailbox_conditions(current_user.id), limit, after=cursor,
+            archived=mailbox_conditions(current_user.id, ArchivedMessage) if archived else (),
+        )
+    )
+    messages = result.scalars().all()
+    return FastJSONResponse({
+        "messages": message_serializer.rows(messages),
+        "high_water_mark": str(messages[-1].id) if messages else since,
+        "has_more": len(messages) == limit,
+    }, headers=dict(response.headers))
+
+@router.get("/search", response_model=MessageSearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    peer_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Полнотекстовый поиск по своим сообщениям (или по чату с peer_id):
+    результаты упорядочены по релевантности, страницы - через offset.
+    Ищет только в оперативной истории: перенесенные в архив сообщения
+    (MESSAGE_ARCHIVE_AFTER_DAYS) не индексируются
+    """
+    hits = await search_messages(db, current_user.id, q, limit + 1, offset, peer_id)
+    has_more = len(hits) > limit
+    return FastJSONResponse({
+        "results": [
+            {**message_serializer.row(message), "rank": rank}
+            for message, rank in hits[:limit]
+        ],
+        "next_offset": offset + limit if has_more else None,
+    })
+
+@router.get("/export")
+async def export(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    peer_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Полная выгрузка своих сообщений (или чата с peer_id) за период
+    [start, end) в NDJSON или CSV, включая архив. Ответ отдается потоком
+    по мере чтения из БД, память сервера не зависит от размера истории
+    """
+    start = to_utc(start) if start else None
+    end = to_utc(end) if end else None
+    # Архив старше оперативной истории, поэтому выгружается первым
+    statements = [
+        export_query(current_user.id, peer_id, start, end, entity)
+        for entity in (ArchivedMessage, Message)
+    ]
+    filename = f"messages-{current_user.id}-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    logger.info("Message export started", extra={"user_id": current_user.id, "format": format, "peer_id": peer_id})
+    return StreamingResponse(
+        export_messages(statements, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @router.get("/chat/{user_id}", response_model=List[MessageSchema])
 async def get_chat_messages(
     user_id: int,
+    request: Request,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    archived: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Получение сообщений чата с конкретным пользователем постранично.
+    С archived=true в историю входят и перенесенные в архив сообщения.
+    Поддерживает If-None-Match: без изменений отвечает 304.
+    С Accept: application/x-ndjson отдает поток NDJSON
+    """
+    version = await mailbox_version(db, current_user.id, peer_id=user_id)
+    not_modified = conditional(
+        request, response, page_etag(
+            request, current_user.id, user_id, version, before or "", after or "", limit, int(archived)
+        )
+    )
+    if not_modified is not None:
+        return not_modified
+
+    messages = await get_history_page(
+        db, response, chat_conditions(current_user.id, user_id), limit, before, after,
+        archived=chat_conditions(current_user.id, user_id, ArchivedMessage) if archived else (),
+    )
+    return list_response(request, response, messages)
+
+@router.get("/conversations", response_model=List[ConversationSchema])
+async def get_conversations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Получение сообщений чата с конкретным пользователем
+    Список диалогов: собеседник, последнее сообщение и число непрочитанных
     """
-    messages = db.query(Message).filter(
-        (
-            (Message.sender_id == current_user.id) & 
-            (Message.recipient_id == user_id)
-        ) | (
-            (Message.sender_id == user_id) & 
-            (Message.recipient_id == current_user.id)
+    return await list_conversations(db, current_user.id, limit)
+
+@router.post("/conversations/{peer_id}/read")
+async def read_conversation(
+    peer_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Отметить диалог с собеседником прочитанным
+    """
+    if not await mark_read(db, current_user.id, peer_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
         )
-    ).order_by(Message.created_at.desc()).all()
-    return messages 
+    await db.commit()
+    return {"status": "success"}
+
+def _stream_token(request) -> Optional[str]:
+    """
+    Токен для потока: заголовок Authorization или параметр ?token=
+    (браузерные WebSocket и EventSource не умеют ставить заголовки)
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return request.query_params.get("token")
+
+async def _stream_user(request) -> Optional[User]:
+    async with SessionLocal() as db:
+        user = await authenticate(db, _stream_token(request))
+    if user is None or not user.is_active:
+        return None
+    return user
+
+@router.websocket("/stream")
+async def message_stream(websocket: WebSocket):
+    """
+    WebSocket с новыми сообщениями текущего пользователя
+    """
+    user = await _stream_user(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        subscription = hub.subscribe(user.id)
+    except TooManyConnections:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+
+    async def receive():
+        # Входящие сообщения не нужны, читаем только чтобы заметить отключение
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while not receiver.done():
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait(
+                [getter, receiver],
+                timeout=settings.STREAM_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter not in done:
+                getter.cancel()
+                if not done:
+                    await websocket.send_json({"type": "ping"})
+                continue
+
+            event = getter.result()
+            if event is None:
+                # Клиент не успевал читать: закрываем, он догрузит историю
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="lagging")
+                break
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        hub.unsubscribe(subscription)
+
+@router.get("/stream")
+async def message_stream_sse(request: Request):
+    """
+    Поток новых сообщений через Server-Sent Events (запасной вариант для WebSocket)
+    """
+    user = await _stream_user(request)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        subscription = hub.subscribe(user.id)
+    except TooManyConnections:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open streams"
+        )
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    yield "event: lagging\ndata: {}\n\n"
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/stats", response_model=dict)
 async def get_message_stats(
+    request: Request,
+    response: Response,
+    days: int = Query(30, ge=1, le=366),
+    peers: int = Query(10, ge=0, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Получение статистики сообщений пользователя
+    Получение статистики сообщений пользователя: итоги, разбивка по
+    дням и по последним собеседникам (из счетчиков, без подсчета истории)
     """
-    total_messages = db.query(Message).filter(
-        (Message.sender_id == current_user.id) | 
-        (Message.recipient_id == current_user.id)
-    ).count()
-    
-    return {
-        "total_messages": total_messages
-    }
+    version = await mailbox_version(db, current_user.id)
+    not_modified = conditional(
+        request, response,
+        make_etag("stats", current_user.id, version, datetime.utcnow().date(), days, peers)
+    )
+    if not_modified is not None:
+        return not_modified
+
+    return await message_stats(db, current_user.id, days, peers)
 
 @router.post("/send-bot-message")
 async def send_bot_message(
     message: str,
     recipient_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Отправка сообщения от имени бота конкретному пользователю
     """
     try:
-        print(f"Attempting to send message to recipient {recipient_id}")
+        logger.debug("Bot message requested", extra={"recipient_id": recipient_id})
         # Находим получателя
-        recipient = db.query(User).filter(User.id == recipient_id).first()
+        recipient = await db.get(User, recipient_id)
         if not recipient:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Получатель не найден"
             )
             
-        print(f"Recipient found: {recipient.username}, telegram_id: {recipient.telegram_id}")
+        logger.debug("Bot message recipient found", extra={"recipient_id": recipient_id, "has_telegram": bool(recipient.telegram_id)})
         if not recipient.telegram_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="У получателя не подключен Telegram"
             )
             
-        # Отправляем сообщение через бота
-        print("Sending message via bot...")
-        await bot.send_message(
-            chat_id=recipient.telegram_id,
-            text=f"🤖 Сообщение от {current_user.username}:\n\n{message}"
-        )
-        print("Message sent successfully")
-        
         # Сохраняем сообщение в базе данных
         db_message = Message(
             content=message,
@@ -146,11 +613,24 @@ async def send_bot_message(
             recipient_id=recipient_id
         )
         db.add(db_message)
-        db.commit()
+        await db.flush()
+        await record_messages(db, [db_message])
+
+        # Ставим сообщение в очередь на отправку через бота
+        enqueue(
+            db,
+            chat_id=recipient.telegram_id,
+            text=f"🤖 Сообщение от {current_user.username}:\n\n{message}",
+            message_id=db_message.id
+        )
+        await db.commit()
+        outbox_dispatcher.notify()
+        await backplane.publish_message(db_message)
+        logger.info("Bot message queued", extra={"message_id": db_message.id, "recipient_id": recipient_id})
         
-        return {"status": "success", "message": "Сообщение отправлено"}
+        return {"status": "success", "message": "Сообщение поставлено в очередь на отправку"}
     except Exception as e:
-        print(f"Error sending message: {str(e)}")
+        logger.exception("Error sending bot message", extra={"recipient_id": recipient_id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -158,26 +638,20 @@ async def send_bot_message(
 
 @router.get("/users", response_model=List[dict])
 async def get_users_for_messages(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Получение списка пользователей для отправки сообщений
+    Первая страница пользователей с подключенным Telegram для отправки
+    сообщений (берется из кеша каталога). Для поиска и следующих страниц -
+    GET /users/search?telegram_only=true
     """
-    try:
-        print("Getting users for messages...")
-        # Получаем только пользователей с подключенным Telegram
-        users = db.query(User).filter(
-            User.id != current_user.id,  # Исключаем текущего пользователя
-            User.telegram_id.isnot(None)  # Только с подключенным Telegram
-        ).all()
-        
-        result = [{"id": user.id, "username": user.username} for user in users]
-        print(f"Found {len(result)} users:", result)
-        return result
-    except Exception as e:
-        print(f"Error getting users: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
\ No newline at end of file
+    # Берем на одного больше: текущий пользователь из списка исключается
+    users, _ = await search_users(db, "", limit + 1, telegram_only=True)
+    result = [
+        {"id": user["id"], "username": user["username"]}
+        for user in users if user["id"] != current_user.id
+    ][:limit]
+    logger.debug("Users for messages listed", extra={"count": len(result)})
+    return result
\ No newline at end of file
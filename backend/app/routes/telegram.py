@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any
 
 from ..database import get_db
-from ..deps import get_current_active_user
+from ..deps import get_current_active_user, invalidate_principal
+from ..directory import invalidate_directory
 from ..models.user import User
 from ..telegram import telegram_client
 from ..schemas.message import MessageCreate
@@ -14,16 +16,19 @@ router = APIRouter(prefix="/telegram", tags=["telegram"])
 async def link_telegram_account(
     telegram_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     Привязка Telegram аккаунта к профилю пользователя
     """
     # Проверяем, не привязан ли уже этот Telegram ID к другому пользователю
-    existing_user = db.query(User).filter(
-        User.telegram_id == telegram_id,
-        User.id != current_user.id
-    ).first()
+    result = await db.execute(
+        select(User).where(
+            User.telegram_id == telegram_id,
+            User.id != current_user.id
+        )
+    )
+    existing_user = result.scalar_one_or_none()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,8 +45,10 @@ async def link_telegram_account(
     # Привязываем Telegram ID к пользователю
     current_user.telegram_id = telegram_id
     db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    invalidate_principal(current_user.username)
+    invalidate_directory()
     
     # Отправляем приветственное сообщение
     await telegram_client.send_message(
@@ -54,7 +61,7 @@ async def link_telegram_account(
 @router.delete("/unlink")
 async def unlink_telegram_account(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     Отвязка Telegram аккаунта от профиля пользователя
@@ -73,8 +80,10 @@ async def unlink_telegram_account(
     
     current_user.telegram_id = None
     db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    invalidate_principal(current_user.username)
+    invalidate_directory()
     
     return {"status": "success"}
 
@@ -82,7 +91,7 @@ async def unlink_telegram_account(
 async def send_telegram_message(
     message: MessageCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     Отправка сообщения через Telegram
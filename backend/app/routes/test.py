@@ -1,6 +1,18 @@
 # test.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db
+from ..deps import principal_cache
+from ..outbox import outbox_dispatcher, outbox_stats
+from ..ratelimit import telegram_rate_limiter
+from ..backplane import backplane
+from ..counters import counter_reconciler
+from ..archive import message_archiver
+from ..realtime import hub
+from ..log import logging_stats
+from ..security import token_cache
+from ..transport import telegram_transport
 
 router = APIRouter(prefix="/test", tags=["test"])
 
@@ -20,4 +32,76 @@ async def health_check():
         "status": "online",
         "service": "Telegram Web Messenger API",
         "version": "1.0.0"
-    }
\ No newline at end of file
+    }
+
+@router.get("/cache")
+async def cache_stats():
+    """
+    Статистика кешей аутентификации
+    """
+    return {
+        "tokens": token_cache.stats(),
+        "principals": principal_cache.stats()
+    }
+
+
+@router.get("/outbox")
+async def outbox_status(db: AsyncSession = Depends(get_db)):
+    """
+    Глубина и возраст очереди доставки в Telegram
+    """
+    return {
+        **await outbox_stats(db),
+        "dispatcher": outbox_dispatcher.stats()
+    }
+
+
+@router.get("/telegram-limiter")
+async def telegram_limiter_stats():
+    """
+    Статистика ожидания в лимитере отправки Telegram
+    """
+    return telegram_rate_limiter.stats()
+
+
+@router.get("/telegram-transport")
+async def telegram_transport_stats():
+    """
+    Пул соединений к Bot API: запросы и переиспользование соединений
+    """
+    return telegram_transport.stats()
+
+
+@router.get("/logging")
+async def logging_queue_stats():
+    """
+    Очередь логирования: ожидающие вывода и отброшенные записи
+    """
+    return logging_stats()
+
+
+@router.get("/stream")
+async def stream_stats():
+    """
+    Подключения к потоку сообщений
+    """
+    return {
+        **hub.stats(),
+        "backplane": backplane.stats()
+    }
+
+
+@router.get("/counters")
+async def counters_stats():
+    """
+    Статистика сверки счетчиков сообщений
+    """
+    return counter_reconciler.stats()
+
+
+@router.get("/archive")
+async def archive_stats():
+    """
+    Статистика архивации сообщений и обслуживания секций
+    """
+    return message_archiver.stats()
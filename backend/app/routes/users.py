@@ -1,22 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from typing import Any
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, Body
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
 from pydantic import BaseModel
 
 from ..database import get_db
-from ..deps import get_current_active_user
+from ..deps import get_current_active_user, invalidate_principal
 from ..models.user import User
-from ..schemas.user import User as UserSchema, UserUpdate
-from ..bot.bot import connection_codes
+from ..schemas.user import User as UserSchema, UserDirectoryEntry, UserUpdate
+from ..bot.codes import code_store
+from ..directory import decode_user_cursor, invalidate_directory, search_users
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Размер страницы каталога пользователей по умолчанию и максимальный
+DIRECTORY_PAGE_SIZE = 20
+MAX_DIRECTORY_PAGE_SIZE = 100
+
 # Добавляем модель для получения кода
 class TelegramConnect(BaseModel):
     code: str
 
 @router.get("/me", response_model=UserSchema)
-def read_current_user(
+async def read_current_user(
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
@@ -24,21 +33,51 @@ def read_current_user(
     """
     return current_user
 
+@router.get("/search", response_model=List[UserDirectoryEntry])
+async def search_directory(
+    response: Response,
+    q: str = Query("", max_length=64),
+    cursor: Optional[str] = None,
+    limit: int = Query(DIRECTORY_PAGE_SIZE, ge=1, le=MAX_DIRECTORY_PAGE_SIZE),
+    telegram_only: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+) -> Any:
+    """
+    Поиск получателей по username (по началу имени, без учета регистра)
+    постранично: курсор следующей страницы - в заголовке X-Next-Cursor
+    """
+    try:
+        position = decode_user_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    users, next_cursor = await search_users(db, q, limit, position, telegram_only)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
+
 @router.put("/me", response_model=UserSchema)
-def update_current_user(
+async def update_current_user(
     user_in: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     Обновить данные текущего пользователя.
     """
     # Проверяем, не занят ли email д��угим пользователем
     if user_in.email:
-        user = db.query(User).filter(
-            User.email == user_in.email,
-            User.id != current_user.id
-        ).first()
+        result = await db.execute(
+            select(User).where(
+                User.email == user_in.email,
+                User.id != current_user.id
+            )
+        )
+        user = result.scalar_one_or_none()
         if user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -47,10 +86,13 @@ def update_current_user(
     
     # Проверяем, не занят ли username другим пользователем
     if user_in.username:
-        user = db.query(User).filter(
-            User.username == user_in.username,
-            User.id != current_user.id
-        ).first()
+        result = await db.execute(
+            select(User).where(
+                User.username == user_in.username,
+                User.id != current_user.id
+            )
+        )
+        user = result.scalar_one_or_none()
         if user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,39 +100,38 @@ def update_current_user(
             )
     
     # Обновляем данные пользователя
+    old_username = current_user.username
     for field, value in user_in.dict(exclude_unset=True).items():
         setattr(current_user, field, value)
     
     db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    invalidate_principal(old_username, current_user.username)
+    invalidate_directory()
     return current_user 
 
 @router.post("/connect-telegram")
 async def connect_telegram(
     data: TelegramConnect,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Подключение Telegram аккаунта к пользователю
     """
     try:
-        print(f"Attempting to connect Telegram with code: {data.code}")
-        print(f"Available codes: {connection_codes}")
-        
-        if data.code not in connection_codes:
+        # Погашаем код в транзакции запроса: при ошибке код останется действительным
+        telegram_id = await code_store.consume(data.code, db=db)
+        if telegram_id is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Неверный код подключения"
             )
         
-        # Получаем Telegram ID и конвертируем в строку
-        telegram_id = str(connection_codes[data.code])  # Конвертируем в строку
-        print(f"Found Telegram ID: {telegram_id}")
-        
         # Проверяем существующего пользователя
-        existing_user = db.query(User).filter(User.telegram_id == telegram_id).first()
+        result = await db.execute(select(User).where(User.telegram_id == telegram_id))
+        existing_user = result.scalar_one_or_none()
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -99,15 +140,18 @@ async def connect_telegram(
         
         # Обновляем пользователя
         current_user.telegram_id = telegram_id
-        db.commit()
-        
-        del connection_codes[data.code]
+        await db.commit()
+        invalidate_principal(current_user.username)
+        invalidate_directory()
         
-        print(f"Successfully connected Telegram for user {current_user.username}")
+        logger.info("Telegram connected", extra={"user_id": current_user.id})
         return {"status": "success", "message": "Telegram успешно подключен"}
         
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        print(f"Error connecting Telegram: {str(e)}")
+        logger.exception("Error connecting Telegram", extra={"user_id": current_user.id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
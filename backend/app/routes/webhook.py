@@ -0,0 +1,37 @@
+import logging
+import secrets
+from fastapi import APIRouter, Header, HTTPException, Request, status
+from typing import Optional
+
+from ..bot.bot import process_update
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["telegram"])
+
+@router.post(settings.TELEGRAM_WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    """
+    Прием обновлений от Telegram в режиме webhook.
+    Обновление передается диспетчеру в фоне, ответ 200 отдается сразу.
+    """
+    if settings.TELEGRAM_MODE != "webhook":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    if not secrets.compare_digest(
+        x_telegram_bot_api_secret_token or "",
+        settings.TELEGRAM_WEBHOOK_SECRET or ""
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    try:
+        process_update(await request.json())
+    except Exception as e:
+        # Некорректное обновление не должно повторяться Telegram'ом
+        logger.warning("Invalid webhook update", extra={"error": str(e)})
+
+    return {"ok": True}
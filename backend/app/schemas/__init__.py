@@ -1,3 +1,4 @@
 from .user import User, UserCreate, UserUpdate
-from .message import Message, MessageCreate
-from .token import Token, TokenData 
\ No newline at end of file
+from .message import Message, MessageCreate, MessageSync, MessageBulkCreate, BulkSendResponse, MessageSearchPage
+from .conversation import Conversation
+from .token import Token, TokenData
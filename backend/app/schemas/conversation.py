@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+# Схема диалога для списка чатов
+class Conversation(BaseModel):
+    peer_id: int
+    peer_username: str
+    last_message_id: Optional[int] = None
+    last_message: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+    unread_count: int = 0
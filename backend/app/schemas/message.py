@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 # Базовая схема сообщения
 class MessageBase(BaseModel):
@@ -19,4 +19,38 @@ class Message(MessageBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+# Ответ инкрементальной синхронизации
+class MessageSync(BaseModel):
+    messages: List[Message]
+    # Значение since для следующего запроса
+    high_water_mark: str
+    has_more: bool
+
+# Рассылка одного сообщения нескольким получателям
+class MessageBulkCreate(BaseModel):
+    content: str
+    recipient_ids: List[int] = Field(min_length=1)
+
+# Результат отправки одному получателю
+class BulkSendResult(BaseModel):
+    recipient_id: int
+    # sent или not_found
+    status: str
+    message_id: Optional[int] = None
+    telegram_queued: bool = False
+
+class BulkSendResponse(BaseModel):
+    sent: int
+    failed: int
+    results: List[BulkSendResult]
+
+# Найденное сообщение и его релевантность (больше - релевантнее)
+class MessageSearchHit(Message):
+    rank: float
+
+class MessageSearchPage(BaseModel):
+    results: List[MessageSearchHit]
+    # offset следующей страницы или None, если страница последняя
+    next_offset: Optional[int] = None
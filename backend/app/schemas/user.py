@@ -32,4 +32,9 @@ class User(UserBase):
                 "is_active": True,
                 "telegram_id": None
             }
-        }
\ No newline at end of file
+        }
+# Пользователь в каталоге (выбор получателя)
+class UserDirectoryEntry(BaseModel):
+    id: int
+    username: str
+    telegram_connected: bool
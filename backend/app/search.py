@@ -0,0 +1,100 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import Float, column, func, insert, literal_column, or_, select, table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models.message import FTS_TABLE, SEARCH_CONFIG, Message
+
+# Слова запроса: буквы, цифры и подчеркивание в любом алфавите
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+fts = table(FTS_TABLE, column("rowid"), column("content"), column(FTS_TABLE))
+
+
+def fts_match_query(words: Sequence[str]) -> str:
+    """
+    Запрос FTS5: все слова (AND), каждое как префикс. Слова берутся в
+    кавычки, поэтому синтаксис FTS5 из строки пользователя не проходит
+    """
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+
+def tsquery(words: Sequence[str]) -> str:
+    """То же для to_tsquery Postgres: 'слово':* & ..."""
+    return " & ".join("'" + word.replace("'", "''") + "':*" for word in words)
+
+
+async def index_messages(db: AsyncSession, messages: Sequence[Message]) -> None:
+    """
+    Добавление новых сообщений в поисковый индекс SQLite. На Postgres
+    tsvector - вычисляемая колонка и обновляется самой вставкой
+    """
+    if not messages or db.bind.dialect.name != "sqlite":
+        return
+    await db.execute(insert(fts), [
+        {"rowid": message.id, "content": message.content or ""}
+        for message in messages
+    ])
+
+
+async def unindex_messages(db: AsyncSession, messages: Sequence[Message]) -> None:
+    """
+    Удаление сообщений из индекса SQLite до удаления самих строк: таблице
+    FTS5 с внешним содержимым нужен исходный текст
+    """
+    if not messages or db.bind.dialect.name != "sqlite":
+        return
+    await db.execute(insert(fts), [
+        {FTS_TABLE: "delete", "rowid": message.id, "content": message.content or ""}
+        for message in messages
+    ])
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    limit: int,
+    offset: int = 0,
+    peer_id: Optional[int] = None,
+) -> List[Tuple[Message, float]]:
+    """
+    Поиск по сообщениям, которые пользователь отправил или получил.
+    Находятся сообщения, содержащие все слова запроса как начала слов
+    (без морфологии, "офис" найдет и "офисе"). Возвращает (сообщение,
+    релевантность) от более релевантных к менее, при равной
+    релевантности - от новых к старым. Архив (messages_archive) не
+    индексируется и в поиск не входит
+    """
+    words = _WORD.findall(q)
+    if not words:
+        return []
+
+    if peer_id is None:
+        owner = or_(Message.sender_id == user_id, Message.recipient_id == user_id)
+    else:
+        owner = or_(
+            (Message.sender_id == user_id) & (Message.recipient_id == peer_id),
+            (Message.sender_id == peer_id) & (Message.recipient_id == user_id),
+        )
+
+    if db.bind.dialect.name == "postgresql":
+        vector = literal_column("messages.search_vector", type_=TSVECTOR)
+        query = func.to_tsquery(SEARCH_CONFIG, tsquery(words))
+        rank = func.ts_rank(vector, query, type_=Float)
+        stmt = select(Message, rank.label("rank")).where(vector.op("@@")(query), owner)
+    else:
+        # bm25 тем меньше, чем документ релевантнее
+        rank = -func.bm25(literal_column(FTS_TABLE), type_=Float)
+        stmt = (
+            select(Message, rank.label("rank"))
+            .join(fts, fts.c.rowid == Message.id)
+            .where(fts.c[FTS_TABLE].op("MATCH")(fts_match_query(words)), owner)
+        )
+
+    result = await db.execute(
+        stmt.order_by(literal_column("rank").desc(), Message.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return [(message, rank) for message, rank in result.all()]
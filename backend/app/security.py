@@ -1,13 +1,21 @@
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from .cache import TTLCache
 from .config import settings
 from .schemas.token import TokenData
 
 # Настройка хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Кеш проверенных токенов: sha256(токен) -> TokenData до момента exp
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка соответствия пароля хешу"""
     try:
@@ -19,6 +27,76 @@ def get_password_hash(password: str) -> str:
     """Получение хеша пароля"""
     return pwd_context.hash(password)
 
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование паролей переполнена"""
+
+
+class PasswordHasher:
+    """
+    Хеширование паролей в пуле процессов.
+
+    bcrypt занимает CPU на десятки-сотни миллисекунд, поэтому вызовы
+    выносятся из event loop. Число одновременных операций ограничено
+    max_concurrency, а при переполнении очереди (max_queue) запрос сразу
+    отклоняется с PasswordHasherBusy.
+    """
+
+    def __init__(self, workers: int, max_concurrency: int, max_queue: int):
+        self.workers = workers
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._pending = 0
+
+    def start(self) -> None:
+        """Запуск пула процессов"""
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self) -> None:
+        """Остановка пула процессов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def pending(self) -> int:
+        """Количество операций в работе и в очереди"""
+        return self._pending
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_concurrency + self.max_queue:
+            raise PasswordHasherBusy()
+
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                if self.workers <= 0:
+                    return func(*args)
+                self.start()
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Асинхронное получение хеша пароля"""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Асинхронная проверка пароля"""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+password_hasher = PasswordHasher(
+    workers=settings.HASH_POOL_WORKERS,
+    max_concurrency=settings.HASH_MAX_CONCURRENCY,
+    max_queue=settings.HASH_MAX_QUEUE,
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Создание JWT токена"""
     to_encode = data.copy()
@@ -38,6 +116,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> Optional[TokenData]:
     """Проверка JWT токена"""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
+
     try:
         payload = jwt.decode(
             token, 
@@ -47,6 +130,9 @@ def verify_token(token: str) -> Optional[TokenData]:
         username: str = payload.get("sub")
         if username is None:
             return None
-        return TokenData(username=username)
+        token_data = TokenData(username=username)
+        if payload.get("exp") is not None:
+            token_cache.set(key, token_data, expires_at=float(payload["exp"]))
+        return token_data
     except JWTError:
         return None 
\ No newline at end of file
@@ -1,11 +1,11 @@
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 from fastapi import HTTPException, status
-from .config import settings
+from .bot.bot import bot
 
 class TelegramClient:
-    def __init__(self):
-        self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+    def __init__(self, bot: Bot):
+        self.bot = bot
     
     async def send_message(self, chat_id: str, text: str) -> bool:
         """
@@ -29,11 +29,5 @@ class TelegramClient:
             return bool(chat)
         except TelegramBadRequest:
             return False
-    
-    async def close(self):
-        """
-        Закрытие сессии бота
-        """
-        await self.bot.session.close()
 
-telegram_client = TelegramClient() 
\ No newline at end of file
+telegram_client = TelegramClient(bot)
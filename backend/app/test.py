@@ -1,16 +1,20 @@
 import asyncio
+import logging
 from aiogram import Bot
 
+logger = logging.getLogger(__name__)
+
 async def test_bot():
     token = "7503574488:AAHd3Jm7UP0iRjnxIrYxE8xOkF_B7R5WjZQ"
     try:
         bot = Bot(token=token)
         me = await bot.get_me()
-        print(f"Бот успешно авторизован как: {me.username}")
+        logger.info("Бот успешно авторизован", extra={"username": me.username})
     except Exception as e:
-        print(f"Ошибка: {e}")
+        logger.exception("Ошибка")
     finally:
         await bot.session.close()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(test_bot())
\ No newline at end of file
@@ -0,0 +1,142 @@
+import asyncio
+import ssl
+import time
+from typing import Optional
+import certifi
+from aiogram import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+from aiohttp import ClientSession, TCPConnector, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from .config import settings
+from .metrics import telegram_latency
+from .ratelimit import RateLimitMiddleware, telegram_rate_limiter
+
+
+class TelegramTransport(AiohttpSession):
+    """
+    Единственная HTTP-сессия к Bot API для всего приложения.
+
+    Все экземпляры Bot создаются с этой сессией, поэтому они делят пул
+    keep-alive соединений, DNS-кеш и лимитер отправки. Сессия создается
+    при первом запросе и закрывается при остановке приложения.
+
+    Сессию aiohttp с настроенным коннектором и trace_configs транспорт
+    создает сам через публичные create_session/close; запросы по-прежнему
+    выполняет AiohttpSession.make_request. Прокси не поддерживается
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        keepalive_timeout: float,
+        timeout: float,
+        dns_cache_ttl: int,
+        api_url: Optional[str] = None,
+    ):
+        api = TelegramAPIServer.from_base(api_url) if api_url else PRODUCTION
+        super().__init__(api=api, timeout=timeout)
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._client: Optional[ClientSession] = None
+        self.requests = 0
+        self.in_flight = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+        self.middleware(RateLimitMiddleware(telegram_rate_limiter))
+
+    def _trace_config(self) -> TraceConfig:
+        """Счетчики запросов и переиспользования соединений из событий aiohttp"""
+        trace = TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+            self.in_flight += 1
+
+        async def on_request_end(session, context, params):
+            self.in_flight -= 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_cache_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_end)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    async def create_session(self) -> ClientSession:
+        if self._client is None or self._client.closed:
+            connector = TCPConnector(
+                ssl=ssl.create_default_context(cafile=certifi.where()),
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            self._client = ClientSession(
+                connector=connector,
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[self._trace_config()],
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+            # Время на закрытие SSL-соединений, как в AiohttpSession.close
+            await asyncio.sleep(0.25)
+
+    async def make_request(self, bot, method, timeout=None):
+        # Время каждого вызова Bot API: method и исход (ok, retry_after, error)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await super().make_request(bot, method, timeout=timeout)
+            outcome = "ok"
+            return result
+        except TelegramRetryAfter:
+            outcome = "retry_after"
+            raise
+        finally:
+            telegram_latency.observe(time.perf_counter() - started, method.__api_method__, outcome)
+
+    def stats(self) -> dict:
+        connections = self.connections_created + self.connections_reused
+        return {
+            "api": self.api.base.split("/bot")[0],
+            "open": self._client is not None and not self._client.closed,
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": round(self.connections_reused / connections, 3) if connections else 0.0,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+
+telegram_transport = TelegramTransport(
+    pool_size=settings.TELEGRAM_POOL_SIZE,
+    keepalive_timeout=settings.TELEGRAM_KEEPALIVE_SECONDS,
+    timeout=settings.TELEGRAM_REQUEST_TIMEOUT,
+    dns_cache_ttl=settings.TELEGRAM_DNS_CACHE_SECONDS,
+    api_url=settings.TELEGRAM_API_URL,
+)
@@ -0,0 +1,33 @@
+"""
+Общие функции бенчмарков
+"""
+import statistics
+from typing import Dict, List, Optional
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(latencies_ms: List[float], statuses: Dict[int, int], elapsed: float) -> dict:
+    """Сводка по сценарию: RPS и перцентили задержки в миллисекундах"""
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return round(value, 2) if value is not None else None
+
+    requests = sum(statuses.values())
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 2) if elapsed else None,
+        "mean_ms": rounded(statistics.fmean(latencies_ms)) if latencies_ms else None,
+        "p50_ms": rounded(percentile(latencies_ms, 50)),
+        "p95_ms": rounded(percentile(latencies_ms, 95)),
+        "p99_ms": rounded(percentile(latencies_ms, 99)),
+        "max_ms": rounded(max(latencies_ms)) if latencies_ms else None,
+    }
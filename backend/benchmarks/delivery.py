@@ -0,0 +1,124 @@
+"""
+Бенчмарк доставки в Telegram: очередь outbox из N сообщений в K чатов
+разбирается диспетчером через эмулятор Bot API с задержками, flood
+control (429 + retry_after) и ошибками 5xx. Показывает время разбора
+очереди, пропускную способность, перцентили времени доставки, число
+повторов и ответы эмулятора.
+
+Пример запуска из каталога backend:
+
+    python -m benchmarks.delivery --messages 600 --chats 20 --latency lognormal:40,0.5
+    python -m benchmarks.delivery --messages 300 --error-rate 0.05 --flood-probability 0.02
+
+Результат печатается в JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from .common import percentile
+from .fake_telegram import FakeTelegram, parse_latency
+
+
+async def run(args):
+    emulator = FakeTelegram(
+        latency=parse_latency(args.latency),
+        chat_rate=args.chat_rate,
+        global_rate=args.global_rate,
+        flood_probability=args.flood_probability,
+        error_rate=args.error_rate,
+        random_seed=args.random_seed,
+    )
+    await emulator.start()
+    # Настройки читаются при импорте приложения, поэтому импорт после старта эмулятора
+    os.environ["TELEGRAM_API_URL"] = emulator.url
+
+    from app.database import SessionLocal, dispose_engine
+    from app.outbox import enqueue, outbox_dispatcher
+    from app.ratelimit import telegram_rate_limiter
+    from app.transport import telegram_transport
+    from .seed import reset_schema
+
+    await reset_schema()
+    async with SessionLocal() as db:
+        for i in range(args.messages):
+            enqueue(db, chat_id=str(100000 + i % args.chats), text=f"delivery {i}")
+        await db.commit()
+
+    started = time.monotonic()
+    emulator.delivered.clear()
+    emulator._started = started
+    outbox_dispatcher.start()
+    try:
+        while True:
+            stats = outbox_dispatcher.stats()
+            if stats["delivered"] + stats["failed"] >= args.messages:
+                break
+            if time.monotonic() - started > args.timeout:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.monotonic() - started
+    finally:
+        await outbox_dispatcher.stop()
+        await telegram_transport.close()
+        await dispose_engine()
+        await emulator.stop()
+
+    delivered_ms = [value * 1000 for value in emulator.delivered]
+    dispatcher = outbox_dispatcher.stats()
+    return {
+        "messages": args.messages,
+        "chats": args.chats,
+        "outbox_concurrency": outbox_dispatcher.concurrency,
+        "emulator": {
+            "latency": {method: repr(value) for method, value in emulator.latency.items()},
+            "chat_rate": args.chat_rate,
+            "global_rate": args.global_rate,
+            "flood_probability": args.flood_probability,
+            "error_rate": args.error_rate,
+            **emulator.stats(),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "completed": dispatcher["delivered"] + dispatcher["failed"] >= args.messages,
+        "delivered_per_s": round(dispatcher["delivered"] / elapsed, 2) if elapsed else None,
+        "delivery_p50_ms": round(percentile(delivered_ms, 50), 2) if delivered_ms else None,
+        "delivery_p95_ms": round(percentile(delivered_ms, 95), 2) if delivered_ms else None,
+        "delivery_p99_ms": round(percentile(delivered_ms, 99), 2) if delivered_ms else None,
+        "dispatcher": dispatcher,
+        "limiter": telegram_rate_limiter.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=30)
+    parser.add_argument("--latency", action="append", default=[],
+                        help="Задержка эмулятора: [метод=]распределение, мс")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="Лимит эмулятора на чат, в секунду")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="Лимит эмулятора на бота, в секунду")
+    parser.add_argument("--flood-probability", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=None, help="OUTBOX_CONCURRENCY")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Предел ожидания разбора очереди, с")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--database-url", default="sqlite:///./delivery.db")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "000000:benchmark")
+    os.environ.setdefault("TELEGRAM_MODE", "disabled")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Повторы после 5xx без долгих пауз, чтобы бенчмарк не ждал минутами
+    os.environ.setdefault("OUTBOX_BACKOFF_BASE", "0.1")
+    os.environ.setdefault("OUTBOX_BACKOFF_MAX", "2")
+    if args.concurrency:
+        os.environ["OUTBOX_CONCURRENCY"] = str(args.concurrency)
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
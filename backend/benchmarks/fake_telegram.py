@@ -0,0 +1,315 @@
+"""
+Эмулятор Bot API для бенчмарков: sendMessage, getChat, getUpdates, getMe
+(остальные методы отвечают true). Поддерживает задержку ответа по
+распределению, flood control с ответами 429 и retry_after, как у
+Telegram, и случайные ошибки 5xx.
+
+Приложение направляется на эмулятор настройкой TELEGRAM_API_URL.
+Отдельный запуск из каталога backend:
+
+    python -m benchmarks.fake_telegram --port 8081 \\
+        --latency lognormal:40,0.5 --latency getUpdates=fixed:0 \\
+        --chat-rate 1 --global-rate 30 --error-rate 0.01
+
+    TELEGRAM_API_URL=http://127.0.0.1:8081 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set
+
+from aiohttp import web
+
+# Предел ожидания getUpdates, как у Telegram
+MAX_POLL_TIMEOUT = 50
+
+
+class Latency:
+    """
+    Распределение задержки ответа в миллисекундах:
+    fixed:50, uniform:20,80, normal:50,10, lognormal:50,0.5 (медиана и
+    sigma), exp:50 (среднее). Отрицательные значения обрезаются до нуля
+    """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+    def __init__(self, kind: str = "fixed", *params: float):
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"invalid latency: {kind}{list(params)}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, value: str) -> "Latency":
+        kind, _, params = value.partition(":")
+        if not params:
+            # "25" - то же, что fixed:25
+            return cls("fixed", float(kind))
+        return cls(kind, *(float(param) for param in params.split(",")))
+
+    def sample(self, rng: random.Random) -> float:
+        """Задержка в секундах"""
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            value = median * math.exp(rng.gauss(0, sigma)) if median > 0 else 0
+        else:
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0
+        return max(0.0, value) / 1000
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(str(param) for param in self.params)}"
+
+
+class Window:
+    """
+    Лимит в духе Telegram: не больше rate * period запросов за скользящее
+    окно period секунд; при превышении - сколько секунд ждать
+    """
+
+    def __init__(self, rate: float, period: float = 1.0):
+        self.limit = max(1, int(rate * period))
+        self.period = period
+        self.times: deque = deque()
+
+    def retry_after(self, now: float) -> int:
+        cutoff = now - self.period
+        while self.times and self.times[0] <= cutoff:
+            self.times.popleft()
+        if len(self.times) < self.limit:
+            self.times.append(now)
+            return 0
+        return max(1, math.ceil(self.times[0] + self.period - now))
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: Optional[Dict[str, Latency]] = None,
+        chat_rate: float = 0,
+        group_rate: float = 20 / 60,
+        global_rate: float = 0,
+        flood_probability: float = 0,
+        retry_after: int = 1,
+        error_rate: float = 0,
+        known_chats: Optional[Set[str]] = None,
+        random_seed: Optional[int] = None,
+    ):
+        """
+        latency - распределения по методам, ключ "*" - для остальных;
+        chat_rate/group_rate/global_rate - лимиты sendMessage в секунду
+        на личный чат, группу и бота (0 - без лимита); flood_probability -
+        доля запросов, получающих 429 с retry_after независимо от лимитов;
+        error_rate - доля ответов 500/502; known_chats - существующие чаты
+        (None - любой), для остальных "chat not found"
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency or {}
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.flood_probability = flood_probability
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.known_chats = known_chats
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.responses: Dict[int, int] = defaultdict(int)
+        # Время приема каждого sendMessage от старта (для бенчмарков доставки)
+        self.delivered: List[float] = []
+        self._rng = random.Random(random_seed)
+        self._global = Window(global_rate) if global_rate > 0 else None
+        self._chats: Dict[str, Window] = {}
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._updates: List[dict] = []
+        self._updates_changed = asyncio.Condition()
+        self._started = time.monotonic()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Порт 0 - выбирается свободный
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._started = time.monotonic()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def push_update(self, update: dict) -> int:
+        """Добавление обновления для getUpdates; update_id назначается здесь"""
+        update = {**update, "update_id": next(self._update_ids)}
+        async with self._updates_changed:
+            self._updates.append(update)
+            self._updates_changed.notify_all()
+        return update["update_id"]
+
+    def _reply(self, status: int, result=None, description: str = "", retry_after: int = 0):
+        self.responses[status] += 1
+        if status == 200:
+            return web.json_response({"ok": True, "result": result})
+        body = {"ok": False, "error_code": status, "description": description}
+        if retry_after:
+            body["parameters"] = {"retry_after": retry_after}
+        return web.json_response(body, status=status)
+
+    def _flood_wait(self, chat_id: str) -> int:
+        """retry_after для sendMessage в чат или 0, если лимиты позволяют"""
+        if self.flood_probability and self._rng.random() < self.flood_probability:
+            return self.retry_after
+        now = time.monotonic()
+        if self._global is not None:
+            wait = self._global.retry_after(now)
+            if wait:
+                return wait
+        rate = self.group_rate if chat_id.startswith("-") else self.chat_rate
+        if rate <= 0:
+            return 0
+        window = self._chats.get(chat_id)
+        if window is None:
+            # Группы ограничены в минуту, личные чаты - в секунду
+            window = self._chats[chat_id] = Window(
+                rate, 60.0 if chat_id.startswith("-") else 1.0
+            )
+        return window.retry_after(now)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        data = await request.post()
+
+        latency = self.latency.get(method, self.latency.get("*"))
+        if latency is not None:
+            await asyncio.sleep(latency.sample(self._rng))
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            status = self._rng.choice((500, 502))
+            return self._reply(status, description="Internal Server Error" if status == 500 else "Bad Gateway")
+
+        chat_id = str(data.get("chat_id", ""))
+        if method in ("sendMessage", "getChat") and self.known_chats is not None:
+            if chat_id not in self.known_chats:
+                return self._reply(400, description="Bad Request: chat not found")
+        chat = {"id": int(chat_id or 0), "type": "group" if chat_id.startswith("-") else "private"}
+
+        if method == "sendMessage":
+            wait = self._flood_wait(chat_id)
+            if wait:
+                return self._reply(
+                    429, description=f"Too Many Requests: retry after {wait}", retry_after=wait
+                )
+            self.delivered.append(time.monotonic() - self._started)
+            return self._reply(200, {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": chat,
+                "text": data.get("text", ""),
+            })
+        if method == "getChat":
+            return self._reply(200, chat)
+        if method == "getMe":
+            return self._reply(200, {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"})
+        if method == "getUpdates":
+            return self._reply(200, await self._get_updates(
+                int(data.get("offset", 0) or 0), int(data.get("timeout", 0) or 0)
+            ))
+        return self._reply(200, True)
+
+    async def _get_updates(self, offset: int, timeout: int) -> list:
+        """Long polling: подтвержденные (id < offset) удаляются, новые ждем до timeout"""
+        async with self._updates_changed:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            if not self._updates and timeout > 0:
+                try:
+                    await asyncio.wait_for(
+                        self._updates_changed.wait(), min(timeout, MAX_POLL_TIMEOUT)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            return list(self._updates)
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "responses": {str(status): count for status, count in sorted(self.responses.items())},
+            "delivered": len(self.delivered),
+        }
+
+
+def parse_latency(values: List[str]) -> Dict[str, Latency]:
+    """["lognormal:40,0.5", "getUpdates=fixed:0"] -> {"*": ..., "getUpdates": ...}"""
+    result = {}
+    for value in values:
+        method, sep, spec = value.partition("=")
+        if not sep:
+            method, spec = "*", value
+        result[method] = Latency.parse(spec)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", action="append", default=[],
+                        help="[метод=]распределение, мс: fixed:50, uniform:20,80, normal:50,10, "
+                             "lognormal:50,0.5, exp:50")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="sendMessage в секунду на чат (0 - без лимита)")
+    parser.add_argument("--group-rate", type=float, default=20 / 60, help="sendMessage в секунду на группу")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="sendMessage в секунду на бота")
+    parser.add_argument("--flood-probability", type=float, default=0.0, help="Доля случайных ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after для случайных 429, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500/502")
+    parser.add_argument("--random-seed", type=int, default=None)
+    args = parser.parse_args()
+
+    async def run():
+        emulator = FakeTelegram(
+            host=args.host,
+            port=args.port,
+            latency=parse_latency(args.latency),
+            chat_rate=args.chat_rate,
+            group_rate=args.group_rate,
+            global_rate=args.global_rate,
+            flood_probability=args.flood_probability,
+            retry_after=args.retry_after,
+            error_rate=args.error_rate,
+            random_seed=args.random_seed,
+        )
+        await emulator.start()
+        print(f"Bot API emulator on {emulator.url}", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await emulator.stop()
+            print(emulator.stats(), flush=True)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
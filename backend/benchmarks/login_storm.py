@@ -0,0 +1,113 @@
+"""
+Бенчмарк: пропускная способность логина и задержка посторонних
+эндпоинтов во время "шторма" логинов.
+
+Пример запуска из каталога backend:
+
+    pip install -r requirements-bench.txt   # httpx для клиента бенчмарка
+    python -m benchmarks.login_storm --workers 4 --logins 200
+    python -m benchmarks.login_storm --workers 0 --logins 50   # хеширование в event loop
+
+Результат печатается в JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from .common import percentile
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+    from app.database import dispose_engine
+    from app.security import password_hasher
+    from .seed import reset_schema
+
+    await reset_schema()
+    password_hasher.start()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register", json={
+            "email": "storm@example.com",
+            "username": "storm",
+            "password": "storm-password",
+        })
+        # Прогрев пула процессов
+        await client.post("/auth/token", data={"username": "storm", "password": "storm-password"})
+
+        statuses = {}
+        probe_latencies = []
+        storm_done = asyncio.Event()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    "/auth/token",
+                    data={"username": "storm", "password": "storm-password"},
+                )
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            # Задержка считается от момента, когда проба должна была стартовать,
+            # поэтому блокировки event loop тоже попадают в результат
+            while not storm_done.is_set():
+                scheduled = time.perf_counter() + args.probe_interval
+                await asyncio.sleep(args.probe_interval)
+                await client.get("/test/ping")
+                probe_latencies.append((time.perf_counter() - scheduled) * 1000)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await probe_task
+
+    password_hasher.shutdown()
+    await dispose_engine()
+
+    return {
+        "hash_pool_workers": password_hasher.workers,
+        "hash_max_concurrency": password_hasher.max_concurrency,
+        "hash_max_queue": password_hasher.max_queue,
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(statuses.get(200, 0) / elapsed, 2),
+        "statuses": statuses,
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": round(statistics.median(probe_latencies), 2) if probe_latencies else None,
+        "probe_p99_ms": round(percentile(probe_latencies, 99), 2) if probe_latencies else None,
+        "probe_max_ms": round(max(probe_latencies), 2) if probe_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="HASH_POOL_WORKERS (0 - хеширование в event loop)")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="HASH_MAX_CONCURRENCY")
+    parser.add_argument("--max-queue", type=int, default=1000, help="HASH_MAX_QUEUE")
+    parser.add_argument("--logins", type=int, default=100, help="Количество логинов")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременных логинов")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Пауза между пробами, с")
+    parser.add_argument("--database-url", default="sqlite:///./login_storm.db")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "000000:benchmark")
+    os.environ["HASH_POOL_WORKERS"] = str(args.workers)
+    os.environ["HASH_MAX_CONCURRENCY"] = str(args.max_concurrency or max(args.workers, 1))
+    os.environ["HASH_MAX_QUEUE"] = str(args.max_queue)
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Генератор тестовых данных для нагрузочных тестов: пользователи
+user0..userN-1 (пароль "password", у части подключен Telegram) и история
+сообщений за последние дни. Диалоги и счетчики заполняются тем же
+кодом, что и при обычной отправке.
+
+Пример запуска из каталога backend:
+
+    python -m benchmarks.seed --users 1000 --messages 100000 --database-url sqlite:///./loadtest.db
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "password"
+BATCH_SIZE = 1000
+
+
+def username(index: int) -> str:
+    return f"user{index}"
+
+
+async def seed(
+    users: int,
+    messages: int,
+    days: int = 30,
+    peers: int = 10,
+    telegram_ratio: float = 0.5,
+    random_seed: int = 1,
+) -> dict:
+    """Заполнение БД; схема уже должна существовать"""
+    from sqlalchemy import insert
+    from app.conversations import record_messages
+    from app.database import SessionLocal
+    from app.models.message import Message
+    from app.models.user import User
+    from app.security import pwd_context
+
+    rng = random.Random(random_seed)
+    hashed_password = pwd_context.hash(PASSWORD)
+    started = time.perf_counter()
+
+    async with SessionLocal() as db:
+        user_ids = []
+        for offset in range(0, users, BATCH_SIZE):
+            rows = [
+                {
+                    "email": f"{username(i)}@example.com",
+                    "username": username(i),
+                    "hashed_password": hashed_password,
+                    "is_active": True,
+                    "telegram_id": str(100000 + i) if rng.random() < telegram_ratio else None,
+                }
+                for i in range(offset, min(users, offset + BATCH_SIZE))
+            ]
+            user_ids.extend(await db.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True), rows
+            ))
+        await db.commit()
+
+        # У каждого пользователя свой круг собеседников, как в реальном мессенджере
+        contacts = {
+            user_id: rng.sample(user_ids, min(peers, len(user_ids)))
+            for user_id in user_ids
+        }
+        first = datetime.utcnow() - timedelta(days=days)
+        step = timedelta(days=days) / max(messages, 1)
+        for offset in range(0, messages, BATCH_SIZE):
+            rows = []
+            for i in range(offset, min(messages, offset + BATCH_SIZE)):
+                sender_id = rng.choice(user_ids)
+                rows.append({
+                    "content": f"message {i}",
+                    "sender_id": sender_id,
+                    "recipient_id": rng.choice(contacts[sender_id]),
+                    "created_at": first + step * i,
+                })
+            batch = (await db.scalars(
+                insert(Message).returning(Message, sort_by_parameter_order=True), rows
+            )).all()
+            await record_messages(db, batch)
+            await db.commit()
+            db.expunge_all()
+
+    return {
+        "users": users,
+        "messages": messages,
+        "seed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+async def reset_schema() -> None:
+    """
+    Пустая схема, как в продакшене: таблицы удаляются и создаются заново
+    миграциями Alembic, а не create_all (на Postgres миграции секционируют
+    messages, модели этого не описывают)
+    """
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+    from app.database import Base, get_engine
+    import app.models  # noqa: F401 - регистрация всех таблиц
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(backend, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(backend, "alembic"))
+    # env.py работает синхронно и сам открывает соединение
+    await asyncio.to_thread(command.upgrade, config, "head")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--peers", type=int, default=10, help="Собеседников у пользователя")
+    parser.add_argument("--telegram-ratio", type=float, default=0.5, help="Доля пользователей с Telegram")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--database-url", default="sqlite:///./loadtest.db")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "000000:benchmark")
+
+    async def run():
+        from app.database import dispose_engine
+
+        await reset_schema()
+        result = await seed(
+            args.users, args.messages, args.days, args.peers,
+            args.telegram_ratio, args.random_seed,
+        )
+        await dispose_engine()
+        return result
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Микробенчмарк сериализации списка сообщений: текущий путь FastAPI
+(валидация response_model + json.dumps), TypeAdapter Pydantic и быстрый
+путь app.serialization (attrgetter + orjson, JSON и NDJSON). Перед
+замером проверяется, что все пути дают одинаковый JSON.
+
+Пример запуска из каталога backend:
+
+    python -m benchmarks.serialization --rows 5000 --repeat 20
+
+Результат (строк в секунду для каждого пути) печатается в JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+
+def make_messages(count: int) -> list:
+    from app.models.message import Message
+
+    started = datetime(2026, 1, 1)
+    return [
+        Message(
+            id=i,
+            content=f"message number {i} with some text",
+            sender_id=i % 100,
+            recipient_id=(i + 1) % 100,
+            telegram_message_id=str(i) if i % 3 else None,
+            created_at=started + timedelta(seconds=i),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+async def run(args) -> dict:
+    from typing import List
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from pydantic import TypeAdapter
+    from app.schemas.message import Message as MessageSchema
+    from app.serialization import message_serializer
+
+    messages = make_messages(args.rows)
+    field = create_response_field(name="Response_messages", type_=List[MessageSchema])
+    adapter = TypeAdapter(List[MessageSchema])
+
+    async def fastapi_path() -> bytes:
+        # То же, что делает FastAPI для response_model=List[MessageSchema]
+        content = await serialize_response(field=field, response_content=messages)
+        return JSONResponse(content).body
+
+    async def type_adapter_path() -> bytes:
+        return adapter.dump_json(adapter.validate_python(messages, from_attributes=True))
+
+    async def fast_path() -> bytes:
+        return message_serializer.dumps(messages)
+
+    async def ndjson_path() -> bytes:
+        return b"".join(message_serializer.ndjson(messages))
+
+    paths = {
+        "fastapi_response_model": fastapi_path,
+        "pydantic_type_adapter": type_adapter_path,
+        "orjson_fast_path": fast_path,
+        "orjson_ndjson": ndjson_path,
+    }
+
+    expected = json.loads(await fastapi_path())
+    for name in ("pydantic_type_adapter", "orjson_fast_path"):
+        assert json.loads(await paths[name]()) == expected, f"{name} output differs"
+    ndjson = [json.loads(line) for line in (await ndjson_path()).splitlines()]
+    assert ndjson == expected, "orjson_ndjson output differs"
+
+    results = {}
+    for name, path in paths.items():
+        await path()  # прогрев
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            await path()
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            "rows_per_s": round(args.rows * args.repeat / elapsed),
+            "ms_per_response": round(elapsed / args.repeat * 1000, 3),
+        }
+
+    baseline = results["fastapi_response_model"]["rows_per_s"]
+    for result in results.values():
+        result["speedup"] = round(result["rows_per_s"] / baseline, 2)
+    return {"rows": args.rows, "repeat": args.repeat, "paths": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Сообщений в ответе")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого пути")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./serialization.db")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "000000:benchmark")
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()